@@ -0,0 +1,56 @@
+"""
+Measures the server-side latency of zooms on a resampled arrangement.
+
+Usage:
+> python benchmarks/latency.py [--points 1000000] [--cells 4] [--repeat 3] [--aggregator MinMaxLTTB]
+
+Builds a grid of lines resampled by plotly-resampler with a latency_log, replays a scripted
+sequence of zooms (zooming in 10x three times, panning, then resetting) with latency.replay
+and prints the slicing, aggregation and payload figures recorded in the log.
+"""
+import argparse
+import warnings
+import numpy as np
+import pandas
+import wraplotly as wp
+
+
+def zooms(start, end):
+    """
+    Returns the scripted x-ranges: three 10x zooms around the middle, a pan and a reset.
+    """
+    middle, span = start + (end - start) / 2, end - start
+    ranges = [(middle - span / 2 / 10 ** i, middle + span / 2 / 10 ** i) for i in range(1, 4)]
+    shift = ranges[-1][1] - ranges[-1][0]
+    return ranges + [(ranges[-1][0] + shift, ranges[-1][1] + shift), None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--cells", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--aggregator", default="MinMaxLTTB")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    timestamps = pandas.date_range("2024-01-01", periods=args.points, freq="s")
+    rng = np.random.default_rng(0)
+    log = wp.latency_log()
+    fig = wp.hstack(
+        *[wp.line(x=timestamps, y=np.cumsum(rng.normal(size=args.points))) for _ in range(args.cells)],
+        resampling=wp.resampling(threshold=0, aggregator=args.aggregator), latency_log=log,
+    ).fig
+
+    durations = wp.latency.replay(fig, zooms(timestamps[0], timestamps[-1]), repeat=args.repeat)
+    print(f"{args.cells} cells of {args.points} points, {len(durations)} relayouts ({args.aggregator})")
+    print(f"relayout: median {np.median(durations) * 1e3:.1f} ms, max {durations.max() * 1e3:.1f} ms\n")
+
+    traces = log.traces()
+    summary = traces.groupby("cell")[["slicing", "aggregation", "points", "payload_bytes"]].mean()
+    summary[["slicing", "aggregation"]] *= 1e3
+    print(summary.rename(columns={"slicing": "slicing (ms)", "aggregation": "aggregation (ms)"}).round(2).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Measures the memory retained by plot objects built from a wide dataframe, once the dataframe
+itself is no longer referenced.
+
+Usage:
+> python benchmarks/memory.py [--rows 100000] [--columns 200] [--objects 5]
+
+Prints, for each kind of object, the memory retained per object (measured with tracemalloc)
+and whether the source dataframe was freed. Objects built with weak_df=True retain nothing,
+they can no longer be drawn once their dataframe is freed.
+"""
+import gc
+import weakref
+import argparse
+import tracemalloc
+import numpy as np
+import pandas
+import wraplotly as wp
+
+
+KINDS = {
+    "scatter": lambda df: wp.scatter(df, "c0", "c1", color="group"),
+    "line": lambda df: wp.line(df, "c0", "c1"),
+    "scatter (weak_df)": lambda df: wp.scatter(df, "c0", "c1", color="group", weak_df=True),
+    "pairplot": lambda df: wp.pairplot(df, color="group", columns=["c0", "c1", "c2"]),
+}
+
+
+def wide_frame(rows, columns):
+    rng = np.random.default_rng(0)
+    df = pandas.DataFrame(rng.random((rows, columns)), columns=[f"c{i}" for i in range(columns)])
+    df["group"] = rng.integers(0, 5, rows)
+    return df
+
+
+def retained(kind, rows, columns, objects):
+    """
+    Returns the bytes retained by the objects once their source dataframe is dropped, and
+    whether that dataframe was freed.
+    """
+    gc.collect()
+    tracemalloc.start()
+    df = wide_frame(rows, columns)
+    source = weakref.ref(df)
+    before = tracemalloc.get_traced_memory()[0] - df.memory_usage(deep=False).sum()
+
+    plots = [KINDS[kind](df) for _ in range(objects)]
+    del df
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    freed = source() is None
+    del plots
+    return max(size, 0), freed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--columns", type=int, default=200)
+    parser.add_argument("--objects", type=int, default=5)
+    args = parser.parse_args()
+
+    frame = wide_frame(args.rows, args.columns).memory_usage(deep=False).sum()
+    print(f"dataframe: {args.rows} x {args.columns + 1}, {frame / 1e6:.1f} MB")
+    print(f"{'object':<18} {'MB per object':>13} {'dataframe freed':>16}")
+    for kind in KINDS:
+        size, freed = retained(kind, args.rows, args.columns, args.objects)
+        print(f"{kind:<18} {size / args.objects / 1e6:>13.2f} {str(freed):>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Measures how the builds using the workers option scale with the number of threads.
+
+Usage:
+> python benchmarks/workers.py [--repeat 3] [--workers 1 2 4]
+
+Prints, for each workload and number of workers (by default 1, 2, 4, ... up to the number of
+cores), the best time of the repeats and the speedup over the first number of workers.
+"""
+import os
+import time
+import argparse
+import warnings
+import numpy as np
+import wraplotly as wp
+
+
+def arrangement(workers):
+    # 16 cells of 200k points, drawn without plotly-resampler
+    x = np.arange(200_000, dtype=float)
+    objects = [wp.line(x=x, y=np.sin(x / (k + 1))) for k in range(16)]
+    with wp.config(min_points_before_resampling=10**8):
+        wp.vstack(*objects, workers=workers).fig
+
+
+def sketches(workers):
+    # 16 chunks of 1M values sketched for an ecdf
+    rng = np.random.default_rng(0)
+    chunks = [rng.normal(size=1 << 20) for _ in range(16)]
+    wp.ecdf(iter((chunk,) for chunk in chunks), workers=workers)
+
+
+def dashboard(workers):
+    # 32 figures of 50k points each
+    x = np.arange(50_000, dtype=float)
+    wp.export_dashboard([wp.line(x=x, y=np.cos(x / (k + 1))) for k in range(32)], workers=workers)
+
+
+WORKLOADS = {"arrangement": arrangement, "sketches": sketches, "dashboard": dashboard}
+
+
+def measure(workload, workers, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        workload(workers)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, nargs="+")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    counts = args.workers or sorted({1, cores} | {2 ** i for i in range(1, cores.bit_length()) if 2 ** i < cores})
+    warnings.simplefilter("ignore")
+
+    print(f"{'workload':<12} {'workers':>7} {'seconds':>8} {'speedup':>8}")
+    for name, workload in WORKLOADS.items():
+        baseline = None
+        for workers in counts:
+            seconds = measure(workload, workers, args.repeat)
+            baseline = baseline if baseline is not None else seconds
+            print(f"{name:<12} {workers:>7} {seconds:>8.3f} {baseline / seconds:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
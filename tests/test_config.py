@@ -0,0 +1,52 @@
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas
+import wraplotly as wp
+from plotly_resampler import FigureWidgetResampler
+
+
+def state(obj):
+    # The dictionaries are copied, the other attributes must stay the same objects
+    # (budget_report is the report of the last build, not an input)
+    return {key: dict(value) if isinstance(value, dict) else value for key, value in vars(obj).items() if key != "budget_report"}
+
+
+def test_config_is_read_at_build_time():
+    obj = wp.line(np.arange(100_000.))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        assert isinstance(obj.fig, FigureWidgetResampler)
+    with wp.config(min_points_before_resampling=1_000_000):
+        assert not isinstance(obj.fig, FigureWidgetResampler)
+        assert not isinstance(wp.hstack(obj, obj).fig, FigureWidgetResampler)
+
+
+def test_concurrent_builds_under_different_configs():
+    df = pandas.DataFrame({"x": np.arange(50_000.), "y": np.random.default_rng(0).random(50_000), "c": np.arange(50_000) % 3})
+    line, scatter = wp.line(df, "x", "y", color="c"), wp.scatter(df, "x", "y", color="c")
+    image = wp.imshow(np.random.default_rng(0).random((200, 200)))
+    grid = wp.hstack(line, scatter)
+    inputs = [line, scatter, image, grid]
+    before = [state(obj) for obj in inputs]
+
+    def build(threshold):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            with wp.config(min_points_before_resampling=threshold, max_image_pixels=threshold):
+                return isinstance(grid.fig, FigureWidgetResampler), np.shape(image.fig.data[0].z)
+
+    thresholds = [1_000, 10_000_000] * 4
+    with ThreadPoolExecutor(max_workers=len(thresholds)) as executor:
+        results = list(executor.map(build, thresholds))
+
+    for threshold, (resampled, shape) in zip(thresholds, results):
+        assert resampled == (threshold < 100_000)
+        assert shape == ((200, 200) if threshold > 40_000 else (29, 29))
+
+    for obj, fields in zip(inputs, before):
+        after = state(obj)
+        assert after.keys() == fields.keys()
+        for key, value in fields.items():
+            assert after[key] == value if isinstance(value, dict) else after[key] is value, key
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas
+import pytest
+import wraplotly as wp
+
+
+def test_uncolored_bucketed_line():
+    line = wp.line(x=np.arange(1000.), y=np.arange(1000.), bucket=10)
+    assert np.array_equal(line.df["x"], np.arange(0, 1000, 10))
+    assert np.allclose(line.df["y"], np.arange(0, 1000, 10) + 4.5)
+    assert len(line.bands[None][0]) == 100
+
+    df = pandas.DataFrame({"t": pandas.date_range("2024-01-01", periods=600, freq="s"), "v": np.arange(600.)})
+    line = wp.line(df, "t", "v", bucket="1min")
+    assert list(line.df["t"]) == list(pandas.date_range("2024-01-01", periods=10, freq="min"))
+
+
+def test_scans_of_modified_columns_are_not_shared():
+    df = pandas.DataFrame({"x": [1., 2, 3, 4], "y": [1., 2, 3, 4], "g": list("aabb")})
+    a = wp.scatter(df, "x", "y", color="g")
+    df["g"] = ["c", "c", "d", "d"]
+    b = wp.scatter(df, "x", "y", color="g")
+    df.loc[0, "g"] = "e"
+    c = wp.scatter(df, "x", "y", color="g")
+
+    names = [trace.name for trace in wp.hstack(a, b, c).fig.data]
+    assert names == ["a", "b", "c", "d", "e", "c", "d"]
+
+
+def test_trendline_of_continuous_color():
+    rng = np.random.default_rng(0)
+    df = pandas.DataFrame({"x": rng.random(500), "c": rng.random(500)})
+    df["y"] = 2 * df["x"]
+    scatter = wp.scatter(df, "x", "y", color="c", trendline="ols")
+
+    for fig in (scatter.fig, wp.hstack(scatter).fig):
+        trends = [trace for trace in fig.data if "ols" in trace.name]
+        assert len(trends) == 1
+        assert np.allclose(trends[0].y, 2 * np.asarray(trends[0].x))
+
+
+def test_hexbin_counts_the_extremes():
+    x = np.arange(300_000)
+    for kind in ("hex", "grid"):
+        assert np.nansum(wp.hexbin(x=x, y=np.sin(x / 1000.), kind=kind).z) == len(x)
+
+
+def test_budget_of_histograms_of_arrays():
+    x = np.arange(20_000.)
+    grid = wp.hstack(wp.line(x=x, y=np.sin(x)), wp.histogram(x=np.random.default_rng(0).random(35_000)), max_points=10_000)
+    with pytest.warns(UserWarning, match="degraded"):
+        fig = grid.fig
+    assert sum(len(trace.x) for trace in fig.data) <= 10_000
+    assert [report["steps"] for report in grid.budget_report][1] == ["pre-aggregated bins"]
+
+    with pytest.warns(UserWarning, match="does not fit its budget"):
+        wp.hstack(wp.bar(x=list("abc") * 1000, y=np.arange(3000.)), max_points=10).fig
+
+
+def test_mimebundle_loads_plotlyjs_from_the_cdn():
+    for _ in range(2):
+        bundle = wp.scatter(x=np.arange(10.), y=np.arange(10.))._repr_mimebundle_()
+        assert "cdn.plot.ly" in bundle["text/html"] and len(bundle["text/html"]) < 100_000
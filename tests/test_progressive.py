@@ -0,0 +1,28 @@
+import warnings
+
+import numpy as np
+import pandas
+import pytest
+import wraplotly as wp
+
+
+def test_preview_of_resampled_unsorted_scatter():
+    rng = np.random.default_rng(0)
+    df = pandas.DataFrame({"x": rng.random(200_000), "y": rng.random(200_000), "g": rng.integers(0, 3, 200_000).astype(str)})
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        preview = wp.scatter(df, "x", "y", color="g").preview(sizes=[1_000, 100_000])
+        assert preview.wait(60), preview.error
+    assert preview.stage == 3
+
+
+def test_refinement_errors_are_reported():
+    preview = wp.line(np.arange(100.)).preview(sizes=[])
+
+    def build(size):
+        raise ValueError("unsorted x")
+
+    preview.build, preview.stages = build, preview.stages + [None]
+    with pytest.warns(UserWarning, match="could not be refined"):
+        preview.refine()
+    assert isinstance(preview.error, ValueError) and not preview.wait(0)
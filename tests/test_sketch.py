@@ -0,0 +1,28 @@
+import numpy as np
+from wraplotly.sketch import kll
+
+
+def rank_error(sketch, values):
+    q = np.linspace(0.001, 0.999, 999)
+    return np.abs(np.searchsorted(np.sort(values), sketch.quantile(q)) / len(values) - q).max()
+
+
+def test_quantile_accuracy():
+    for seed in range(3):
+        values = np.random.default_rng(seed).normal(size=500_000)
+        sketch = kll(seed=seed)
+        for chunk in np.array_split(values, 50):
+            sketch.update(chunk)
+        assert rank_error(sketch, values) <= 1.7 / sketch.k
+        assert len(sketch) <= 3.5 * sketch.k
+
+
+def test_merge():
+    values = np.random.default_rng(0).exponential(size=400_000)
+    sketches = [kll(seed=i).update(chunk) for i, chunk in enumerate(np.array_split(values, 8))]
+    merged = sketches[0]
+    for sketch in sketches[1:]:
+        merged.merge(sketch)
+    assert merged.n == len(values)
+    assert merged.min == values.min() and merged.max == values.max()
+    assert rank_error(merged, values) <= 1.7 / merged.k
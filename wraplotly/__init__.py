@@ -1,7 +1,13 @@
+__version__ = "2.0"
+
 # Seaborn color palettes
 # https://seaborn.pydata.org/tutorial/color_palettes.html
 discrete_palette = "colorblind"
 continuous_palette = "Plasma"
 
 from .draw import *
-from .arrange import *
\ No newline at end of file
+from .arrange import *
+from .utils import resampling, config
+from .cache import figure_cache
+from .latency import latency_log
+from .export import export_dashboard
\ No newline at end of file
@@ -1,4 +1,5 @@
 import pandas
+from wraplotly import utils
 from wraplotly.draw import line
 from wraplotly.base import make_grid
 
@@ -33,6 +34,8 @@ class grid(make_grid):
         self.objects = []
         self.object_cnt = 0
         self.kwargs = kwargs
+        # Invalid options are reported now rather than when the figure is built
+        utils.resampling_assertion(kwargs.get("resampling"), type(self).__name__)
         self.nb_of_objects = len(set(x for line in grid for x in line))
 
     def __call__(self, *objects):
@@ -41,13 +44,16 @@ class grid(make_grid):
 
         self.object_cnt += 1
         self.objects.append([(obj, {}) for obj in objects])
+        self._repr_fig = None
 
     @property
     def fig(self):
         if self.object_cnt != self.nb_of_objects:
             raise RuntimeError(f"Not enough objects, expected {self.nb_of_objects} but got {self.object_cnt} instead.")
-        super().__init__(self.grid, self.objects, **self.kwargs)
-        return super().fig
+        grid = make_grid(self.grid, self.objects, **self.kwargs)
+        fig = grid.fig
+        self.budget_report = grid.budget_report
+        return fig
 
 
 class hstack(grid):
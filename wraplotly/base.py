@@ -1,13 +1,16 @@
 """
 Mother classes of wraplotly.
 """
+import copy
 import pandas
+import weakref
 import warnings
 import numpy as np
-import seaborn as sns
 from plotly import subplots
-from wraplotly import discrete_palette, utils
+import plotly.graph_objects as go
+from wraplotly import utils, latency, progressive
 from plotly_resampler import FigureWidgetResampler
+from concurrent.futures import ThreadPoolExecutor
 
 
 MIN_OBJECTS_UNTIL_HEATMAP = 2
@@ -37,6 +40,20 @@ class make_grid:
         plotly method (this makes it possible to pass explicit plotly's paramaters to the trace).
     + show_unnammed_traces: bool
         If true displays a default name for each plot in the arragements' legend.
+    + resampling: utils.resampling
+        The resampling policy of the arragement (its threshold is compared to the total number
+        of points in the figure).
+    + workers: int
+        The number of threads building the traces of the cells (default: the workers option).
+    + max_bytes: int
+        An output budget: the estimated size of the serialized traces. Traces above their
+        share are degraded (see utils.apply_budget) and budget_report lists what was degraded.
+        Resampled figures are not concerned (their data is sent on demand).
+    + max_points: int
+        An output budget in number of points, shared like max_bytes.
+    + latency_log: latency.latency_log
+        If given, the resampled figure records the cost of every relayout of its traces
+        in this log (see wraplotly.latency).
     + kwargs:
         Extra arguments passed to the make_subplot plotly function.
     
@@ -44,10 +61,16 @@ class make_grid:
     -------
     + fig (proprety):
         Returns the plotly object associated with the object heriting from plot2d
+    + afig / ato_json (coroutines):
+        Build the figure (or its JSON) in an executor without blocking the event loop
+    + to_html:
+        Exports the figure as a standalone HTML page (arrays shared by traces are sent once)
     + show:
-        Shows the figure
+        Shows the figure (notebooks display the arrangement itself, its figure is built once)
     """
-    def __init__(self, grid, objects, show_unnamed_traces=False, **kwargs):
+    _repr_fig = None
+
+    def __init__(self, grid, objects, show_unnamed_traces=False, resampling=None, workers=None, max_bytes=None, max_points=None, latency_log=None, **kwargs):
         assert grid is not None, "grid argument cannot be None."
         assert objects is not None, "objects argument cannot be None."
 
@@ -57,6 +80,11 @@ class make_grid:
         self.rows = self.grid.shape[0]
         self.cols = self.grid.shape[1]
         self.show_unnamed_traces = show_unnamed_traces
+        self.resampling = utils.resampling_assertion(resampling, type(self).__name__)
+        self.workers = workers
+        self.max_bytes, self.max_points = max_bytes, max_points
+        self.latency_log = latency_log
+        self.budget_report = []
 
         self.flatten_objects = [obj[0] for object in self.objects for obj in object]
 
@@ -184,6 +212,10 @@ class make_grid:
         the color argument to be used in grids. Since grids only work with graph_objects
         we have to manualy deal with colors (adding a trace for each subset of the dataset
         associated with a specific class in the color column)
+
+        Numeric color columns with many values are drawn continuously instead: the column is
+        kept as a numpy array (self.heatmaps maps each of these objects to it) and every cell
+        is bound to one shared coloraxis, whose range (self.color_range) covers all of them.
         """
         self.palette = {}
         self.heatmaps = {}
@@ -194,28 +226,24 @@ class make_grid:
         for i, obj in enumerate(self.flatten_objects):
             if 'c' not in obj.args_type:
                 continue
-            
-            if obj.color is not None and isinstance(obj.color, str):
-                self.color_titles.add(obj.color)
 
-            if obj.df is not None and obj.color is not None:
-                object_color_len = len(set(obj.df[obj.color]))
-                if obj.use_heatmaps and not np.issubdtype(obj.df[obj.color].dtype, np.number):
+            if obj.wide:
+                nb_of_colors += len(obj.y)
+            elif obj.df is not None and obj.color is not None:
+                object_color_len = obj.scan(obj.df[obj.color]).nunique
+                if obj.use_heatmaps and object_color_len > utils.get_option("min_objects_until_heatmap"):
+                    if pandas.api.types.is_numeric_dtype(obj.df[obj.color]) and not pandas.api.types.is_bool_dtype(obj.df[obj.color]):
+                        self.heatmaps[obj] = obj.df[obj.color].to_numpy(dtype=float)
+                        continue
                     warnings.warn(f"color column '{obj.color}' has a large amount of possibles values yet they are not numeric.")
-                    nb_of_colors += object_color_len
-                elif obj.use_heatmaps and object_color_len > MIN_OBJECTS_UNTIL_HEATMAP:
-                    color_column = obj.df[obj.color]
-                    self.update_color(i, f"Colorscale {i+1}") # Why not the actual color ?
-                    self.heatmaps[obj.color] = list(color_column)
-                else:
-                    nb_of_colors += object_color_len
+                nb_of_colors += object_color_len
             else:
                 nb_of_colors += 1
 
-        colors = [
-            '#%02x%02x%02x' % (int(r*255), int(g*255), int(b*255))\
-            for r, g, b in sns.color_palette(discrete_palette, n_colors=nb_of_colors)
-        ]
+            if obj.color is not None and isinstance(obj.color, str):
+                self.color_titles.add(obj.color)
+
+        colors = utils.color_palette(nb_of_colors)
 
         color_idx = 0
 
@@ -223,21 +251,26 @@ class make_grid:
             if 'c' not in object.args_type:
                 continue
 
-            if object.color is None:
+            if object.wide:
+                # wide form: one color per column
+                for column in object.y:
+                    if column not in visited_colors:
+                        self.palette[column] = colors[color_idx]
+                        visited_colors.add(column)
+                        color_idx += 1
+            elif object.color is None:
                 self.update_color(i, f"{object.name} {i+1}")
                 self.palette[object.color] = colors[color_idx]
                 color_idx += 1
-            elif object.df is not None and object.color not in self.heatmaps:
-                for color in set(object.df[object.color]):
+            elif object.df is not None and object not in self.heatmaps:
+                for color in object.scan(object.df[object.color]).uniques:
                     if color not in visited_colors:
                         self.palette[color] = colors[color_idx]
                         visited_colors.add(color)
                         color_idx += 1
 
-        if len(self.heatmaps) > 1:
-            warnings.warn("Multiple heatmaps will result in overlaping legends.")
-
-        self.color_list = list(self.palette.keys()) + list(self.heatmaps.keys())
+        self.color_list = list(self.palette.keys())
+        self.color_range = utils.nan_range(self.heatmaps.values()) if self.heatmaps else None
 
 
     def select_from_df(self, wp_object, c=None):
@@ -247,17 +280,22 @@ class make_grid:
 
         It is important to notice this function is never called if the args_type
         of object does not contain x or y or c
+
+        The rows of a color are taken from the group indices of the color column (computed
+        once for every color) instead of comparing the whole column to each color.
         """
         df, x, y, color = wp_object.df, wp_object.x, wp_object.y, wp_object.color
 
         if c is not None:
+            indices = wp_object.scan(df[color]).indices(c)
+
             if x and isinstance(x, str):
-                xout = df[df[color] == c][x]
+                xout = df[x].take(indices)
             else:
                 xout = x
 
             if y and isinstance(y, str):
-                yout = df[df[color] == c][y]
+                yout = df[y].take(indices)
             else:
                 yout = y
         else:
@@ -274,61 +312,101 @@ class make_grid:
         return xout, yout
 
 
-    def make_go_objects(self, wp_object, row):
+    def plan_go_objects(self, wp_object):
         """
-        Builds the plotly graph_object based on the wrapper wp_object (given by wraplotly)
-        This returns a list of graph_objects that contains only one graph_object if there are
-        no colors in the data or multiple elements in the list when a color is given.
+        Decides which traces will be built for the wrapper wp_object: a list of tuples
+        (color value selecting the data or None, color, name, show_name).
+
+        This is done sequentially, in the order of the grid, since the legend entries
+        depend on which trace first uses a color.
         """
         def get_color(c):
             if c is None:
                 return None
-            if c in self.palette:
-                return self.palette[c]
-            return self.heatmaps[c]
-
-        go_objects = []
-
-        if wp_object.color is not None and wp_object.df is not None and wp_object.color in wp_object.df:
-            for c in set(wp_object.df[wp_object.color]):
+            return self.palette[c]
+
+        plan = []
+
+        if wp_object in self.heatmaps:
+            # continuous colors: a single trace colored by the whole column
+            plan.append((None, self.heatmaps[wp_object], wp_object.color, False))
+        elif wp_object.wide:
+            for column in wp_object.y:
+                show_name = column in self.color_list
+                if show_name: self.color_list.remove(column)
+                plan.append((column, get_color(column), column, show_name))
+        elif wp_object.color is not None and wp_object.df is not None and wp_object.color in wp_object.df:
+            for c in wp_object.scan(wp_object.df[wp_object.color]).uniques:
                 if c in self.color_list:
                     self.color_list.remove(c)
                     show_name = True
                 else:
                     show_name = False
 
-                x, y = self.select_from_df(wp_object, c)
-                go_objects.append(wp_object.__go__(x, y, get_color(c), c, show_name, row))
-        elif wp_object.df is not None:
-            if wp_object.color in self.color_list: self.color_list.remove(wp_object.color)
-            x, y = self.select_from_df(wp_object)
-            go_objects = [wp_object.__go__(
-                x, 
-                y,
-                get_color(wp_object.color), 
-                wp_object.color, 
-                self.show_unnamed_traces,
-                row
-            )]
+                plan.append((c, get_color(c), c, show_name))
         else:
             if wp_object.color in self.color_list: self.color_list.remove(wp_object.color)
-            go_objects = [wp_object.__go__(
-                wp_object.x, 
-                wp_object.y,
-                get_color(wp_object.color), 
-                wp_object.color, 
-                self.show_unnamed_traces,
-                row
-            )]
+            plan.append((None, get_color(wp_object.color), wp_object.color, self.show_unnamed_traces))
+
+        return plan
+
+
+    def make_go_objects(self, wp_object, row, plan=None):
+        """
+        Builds the plotly graph_object based on the wrapper wp_object (given by wraplotly)
+        This returns a list of (graph_object, hf) tuples that contains only one element if there
+        are no colors in the data or multiple elements in the list when a color is given.
+
+        When the figure is resampled, scatter traces are built without their data, which is given
+        as hf = (x, y) to the resampler instead: large (possibly memory-mapped) arrays are then
+        never copied by plotly's validation. hf is None for the other traces.
+
+        Only reads the state of the grid once the plan is made, so it can be called from
+        multiple threads.
+        """
+        plan = plan if plan is not None else self.plan_go_objects(wp_object)
+        go_objects = []
+
+        def flatten(go_object):
+            # Some objects (like bucketed lines) draw more than one trace
+            return go_object if isinstance(go_object, list) else [go_object]
+
+        for c, color, name, show_name in plan:
+            if wp_object.wide:
+                # wide form: every column shares the same x buffer
+                x = wp_object.df[wp_object.x] if wp_object.x is not None else wp_object.df.index
+                y = wp_object.df[c]
+            elif wp_object.df is not None:
+                x, y = self.select_from_df(wp_object, c)
+            else:
+                x, y = wp_object.x, wp_object.y
+
+            if self.needs_resample:
+                # a continuous color is resampled along with the data
+                continuous = isinstance(color, np.ndarray)
+                lazy = flatten(wp_object.__go__(None, None, color[:0] if continuous else color, name, show_name, row))
+                data_traces = [g.type in ("scatter", "scattergl") and g.x is None and g.y is None for g in lazy]
+                if any(data_traces) and all(g.type in ("scatter", "scattergl") for g in lazy):
+                    hf = (x, y, color) if continuous else (x, y)
+                    go_objects += [(g, hf if is_data else None) for g, is_data in zip(lazy, data_traces)]
+                    continue
+
+            go_objects += [(g, None) for g in flatten(wp_object.__go__(x, y, color, name, show_name, row))]
 
         return go_objects
 
 
-    def add_trace(self, go_object, **trace_kwargs):
+    def add_trace(self, go_object, resampling=None, hf=None, **trace_kwargs):
         if self.needs_resample:
-            hf_x = go_object['x'] if 'x' in go_object else None
-            hf_y = go_object['y'] if 'y' in go_object else None
-            self._fig.add_trace(go_object, hf_x=hf_x, hf_y=hf_y, **trace_kwargs)
+            if hf is None:
+                hf = (go_object['x'] if 'x' in go_object else None, go_object['y'] if 'y' in go_object else None)
+            hf_x, hf_y, *hf_color = hf
+            resampling_kwargs = resampling.trace_kwargs() if resampling else {}
+            if hf_color:
+                resampling_kwargs["hf_marker_color"] = hf_color[0]
+            self._fig.add_trace(go_object, hf_x=hf_x, hf_y=hf_y, **resampling_kwargs, **trace_kwargs)
+            if self.latency_log is not None:
+                self.latency_log.register(self._fig.data[-1].uid, cell=(trace_kwargs.get("row"), trace_kwargs.get("col")), name=go_object.name)
         else:
             self._fig.add_trace(go_object, **trace_kwargs)
 
@@ -355,20 +433,80 @@ class make_grid:
         # If two traces will act like the same color, dissable clicking
         self.disable_legend_click = False
 
+        # The legend decisions are made sequentially...
+        cells = []
         for objects in self.objects:
             for object, trace_kwargs in objects:
                 if object.args_type == "plain": # might not be general enough
-                    self.add_trace(object.__go__(), **trace_kwargs)
+                    cells.append((object, trace_kwargs, None))
                     continue
                 
-                if object.color is not None and object.df is not None:
+                if object.color is not None and object.df is not None and object not in self.heatmaps:
                     if not self.disable_legend_click and object.color in object.df:
                         key = (trace_kwargs['row'], trace_kwargs['col'])
-                        object_colors[key] = set(object.df[object.color])
+                        object_colors[key] = set(object.scan(object.df[object.color]).uniques)
                         self.disable_legend_click = same_colors_in_different_traces(object_colors, key)
 
-                for go_object in self.make_go_objects(object, trace_kwargs["row"]):
-                    self.add_trace(go_object, **trace_kwargs)
+                cells.append((object, trace_kwargs, self.plan_go_objects(object)))
+
+        def make_cell_traces(object, trace_kwargs, plan):
+            utils.raise_if_cancelled()
+            if plan is None:
+                go_objects = object.__go__()
+                return [(g, None) for g in (go_objects if isinstance(go_objects, list) else [go_objects])]
+            return self.make_go_objects(object, trace_kwargs["row"], plan)
+
+        # ...the traces of each cell are built in parallel...
+        workers = self.workers if self.workers else utils.get_option("workers") or 1
+        if workers > 1 and len(cells) > 1:
+            with ThreadPoolExecutor(max_workers=min(workers, len(cells))) as executor:
+                cell_traces = utils.map_in_context(executor, make_cell_traces, *zip(*cells))
+        else:
+            cell_traces = [make_cell_traces(*cell) for cell in cells]
+
+        # The budget is fitted first: the decimated axes are no longer evenly spaced
+        if self.max_bytes is not None or self.max_points is not None:
+            self.fit_budget(cells, cell_traces)
+        if not self.needs_resample:
+            self.encode_regular_axes(cell_traces)
+
+        # ...and added to the figure in order
+        for (object, trace_kwargs, _), go_objects in zip(cells, cell_traces):
+            for go_object, hf in go_objects:
+                self.add_trace(go_object, object.resampling, hf, **trace_kwargs)
+
+
+    def encode_regular_axes(self, cell_traces):
+        """
+        Replaces the evenly spaced x-axes (numbers or dates) of scatter and bar traces by
+        x0/dx: the many traces sharing a regular index (like a datetime index) no longer
+        repeat it in the figure.
+        """
+        for go_objects in cell_traces:
+            for go_object, _ in go_objects:
+                if go_object.type not in ("scatter", "scattergl", "bar") or go_object.orientation == "h":
+                    continue
+                if go_object.x is None or go_object.x0 is not None or go_object.y is None or len(go_object.y) != len(go_object.x):
+                    continue
+                step = utils.regular_step(go_object.x)
+                if step is not None:
+                    go_object.update(x=None, x0=step[0], dx=step[1])
+
+
+    def fit_budget(self, cells, cell_traces):
+        """
+        Shares the output budget between the traces of every cell and degrades the ones
+        above their share (see utils.apply_budget).
+        """
+        if self.needs_resample:
+            warnings.warn("The output budget is ignored since the figure is resampled (plotly-resampler sends the data on demand).")
+            return
+
+        traces = [go_object for go_objects in cell_traces for go_object, _ in go_objects]
+        labels = [(trace_kwargs["row"], trace_kwargs["col"]) for (_, trace_kwargs, _), go_objects in zip(cells, cell_traces) for _ in go_objects]
+        self.budget_report = utils.apply_budget(traces, self.max_bytes, self.max_points, labels)
+        if self.budget_report:
+            warnings.warn(f"The figure exceeded its output budget: {len(self.budget_report)} trace(s) were degraded (see budget_report).")
 
 
     def update_layout(self, **kwargs):
@@ -387,6 +525,15 @@ class make_grid:
             kwargs["legend_itemdoubleclick"] = False
             warnings.warn("Legend actions were disabled since different traces share the same color.")
             
+        if self.heatmaps and "coloraxis" not in kwargs:
+            # one colorbar for every continuously colored cell
+            titles = list(dict.fromkeys(obj.color for obj in self.heatmaps))
+            cmin, cmax = self.color_range
+            kwargs["coloraxis"] = dict(
+                colorscale=next(iter(self.heatmaps)).colorscale or utils.get_option("continuous_palette"), cmin=cmin, cmax=cmax,
+                colorbar=dict(title=", ".join(map(str, titles)))
+            )
+
         self._fig.update_layout(legend_tracegroupgap=30, **kwargs)
 
     
@@ -411,14 +558,79 @@ class make_grid:
                     self._fig['layout'][f'yaxis{i+1}']['title'] = all_y_trace_axis[0]
 
 
+    def copy(self):
+        """
+        Returns a copy of the arrangement in which the figure can be built: the objects
+        and the dictionaries passed to the traces are copied (not their data) so that
+        building the figure never modifies the inputs.
+        """
+        grid = copy.copy(self)
+        grid.kwargs = dict(self.kwargs)
+        grid.objects = [[(obj.copy(), dict(trace_kwargs)) for obj, trace_kwargs in objects] for objects in self.objects]
+        grid.flatten_objects = [obj[0] for object in grid.objects for obj in object]
+        return grid
+
+
+    def sample(self, size, scans=None):
+        """
+        Returns a copy of the arrangement drawing samples of about size points of its objects
+        (see plot2d.sample).
+        """
+        grid = copy.copy(self)
+        grid.objects = [[(obj.sample(size, scans), dict(trace_kwargs)) for obj, trace_kwargs in objects] for objects in self.objects]
+        grid.flatten_objects = [obj[0] for object in grid.objects for obj in object]
+        grid._repr_fig = None
+        return grid
+
+
+    def sort_x(self):
+        """
+        Returns a copy of the arrangement whose objects are sorted by x if the figure is
+        resampled (plotly-resampler needs sorted x-axes, see plot2d.sort_x).
+        """
+        objects = [obj for object in self.objects for obj, _ in object]
+        policy = self.kwargs.get("resampling") or getattr(self, "resampling", None) or utils.resampling()
+        if not (policy.needs_resample(sum(obj.nb_points for obj in objects)) or any(obj.needs_resample for obj in objects)):
+            return self
+
+        grid = copy.copy(self)
+        grid.objects = [[(obj.sort_x(True), dict(trace_kwargs)) for obj, trace_kwargs in objects] for objects in self.objects]
+        grid.flatten_objects = [obj[0] for object in grid.objects for obj in object]
+        grid._repr_fig = None
+        return grid
+
+
+    def preview(self, sizes=None, callback=None):
+        """
+        Draws the arrangement progressively (see progressive.preview).
+        """
+        return progressive.preview(self, sizes, callback)
+
+
     @property
-    def fig(self):   
+    def fig(self):
+        grid = self.copy()
+        fig = grid.build()
+        self.budget_report = grid.budget_report
+        return fig
+
+
+    def build(self):
+        utils.raise_if_cancelled()
+        # The data of every cell is scanned here, once per column (see utils.column_scans)
+        self.scans = utils.column_scans()
+        for obj in self.flatten_objects:
+            obj.prepare(self.scans)
         self.make_specs()
 
         # Call FigureWidgetResampler (plotly-resampler) if necessary
-        self.needs_resample = any(obj.needs_resample for obj in self.flatten_objects)
+        nb_points = sum(obj.nb_points for obj in self.flatten_objects)
+        self.needs_resample = self.resampling.needs_resample(nb_points) or any(obj.needs_resample for obj in self.flatten_objects)
         if self.needs_resample:
-            self._fig = FigureWidgetResampler(self.make_subplots())
+            if self.latency_log is not None:
+                self._fig = latency.instrumented_resampler(self.make_subplots(), self.latency_log, **self.resampling.figure_kwargs())
+            else:
+                self._fig = FigureWidgetResampler(self.make_subplots(), **self.resampling.figure_kwargs())
         else:
             self._fig = self.make_subplots()
 
@@ -430,11 +642,37 @@ class make_grid:
         return self._fig
 
 
+    def to_html(self, path=None, include_plotlyjs="cdn"):
+        """
+        Returns (or writes to path) a standalone HTML page of the figure in which the arrays
+        repeated across traces are serialized once (see utils.share_buffers).
+        """
+        figure = self.fig.to_dict()
+        html = utils.figure_html(figure, utils.share_buffers(figure), include_plotlyjs)
+        if path is None:
+            return html
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(html)
+
+
+    async def afig(self, executor=None, timeout=None):
+        return await utils.run_async(lambda: self.fig, executor, timeout)
+
+    async def ato_json(self, executor=None, timeout=None):
+        return await utils.run_async(lambda: self.fig.to_json(), executor, timeout)
+
     def show(self):
         self.fig.show()
 
+    def _repr_mimebundle_(self, include=None, exclude=None):
+        # The figure is built once, the first time the arrangement is displayed
+        if self._repr_fig is None:
+            self._repr_fig = self.fig
+        return utils.figure_mimebundle(self._repr_fig, repr(self), include, exclude)
+
     def __repr__(self):
-        self.show(); return ''
+        rows, cols = np.shape(self.grid)
+        return f"{type(self).__name__}({rows}x{cols}, objects={sum(len(objects) for objects in self.objects)})"
 
 
 class draw:
@@ -445,16 +683,90 @@ class draw:
     -------
     + fig (proprety):
         Returns the plotly object associated with the object heriting from plot2d
+    + afig / ato_json (coroutines):
+        Build the figure (or its JSON) in an executor without blocking the event loop
     + show:
-        Shows the figure
+        Shows the figure (notebooks display the object itself, its figure is built once)
     """
     # The type given to the specs when using plotly's subplots
     type = "scatter"
     args_type = "plain"
     use_heatmaps = False
-    needs_resample = False
+    nb_points = 0
+    resampling = None
     x_axis, y_axis = None, None
     color_discrete_sequence = None
+    max_bytes, max_points = None, None
+    latency_log = None
+    scans = None
+    # The keys of the projected columns (see utils.source_keys) and a weak reference to the projection
+    source = None
+    _repr_fig = None
+
+    @property
+    def needs_resample(self):
+        # Decided when the figure is built, so that the options of wp.config apply
+        return self.resampling is not None and self.resampling.needs_resample(self.nb_points)
+
+    def copy(self):
+        """
+        Returns a shallow copy of the object (the data is shared, the keyword arguments are not).
+        """
+        obj = copy.copy(self)
+        obj.kwargs = dict(self.kwargs)
+        return obj
+
+    def sample(self, size, scans=None):
+        """
+        Returns a copy of the object drawing a sample of about size points (objects that
+        cannot be sampled return themselves).
+        """
+        return self
+
+    def sort_x(self, resampled=None):
+        """
+        Returns a copy of the object sorted by x if it is resampled (objects that cannot be
+        sorted return themselves).
+        """
+        return self
+
+    def preview(self, sizes=None, callback=None):
+        """
+        Draws the object progressively: a FigureWidget is drawn from a small sample right away
+        and refined in a background thread (see progressive.preview).
+        """
+        return progressive.preview(self, sizes, callback)
+
+    def prepare(self, scans):
+        """
+        Runs the work deferred from the constructor to build time (like the scans of the
+        data) with the column scans shared by every cell of the figure. An object is only
+        prepared once.
+        """
+        if self.scans is None:
+            self.scans = scans
+            self.share_scans(scans)
+
+    def share_scans(self, scans):
+        """
+        Keys the scans of the columns projected from a dataframe by the memory of the source
+        columns: every object projecting the same columns (each holding its own copy) then
+        shares their scans, as long as the copies are equal (see utils.column_scans.share).
+        """
+        if self.source is None:
+            return
+        keys, projection = self.source[0], self.source[1]()
+        # The projection may have been replaced since (aggregated, sampled)
+        if projection is None or projection is not self.df:
+            return
+        for column, key in keys.items():
+            scans.share(projection[column], key)
+
+    def scan(self, values):
+        """
+        Returns the scan of a column of the object (see utils.column_scans).
+        """
+        return (self.scans if self.scans is not None else utils.column_scans()).scan(values)
 
     def set_color_discrete_sequence(self, nb_of_colors=None, color_key="color_discrete_sequence"):
         if color_key in self.kwargs:
@@ -463,29 +775,62 @@ class draw:
         if nb_of_colors is None:
             if self.color is not None:
                 if self.df is not None and isinstance(self.df, pandas.core.frame.DataFrame):
-                    nb_of_colors = len(set(self.df[self.color]))
+                    nb_of_colors = self.scan(self.df[self.color]).nunique
                 else:
                     nb_of_colors = len(set(self.color))
+            elif getattr(self, "wide", False):
+                nb_of_colors = len(self.y)
             else:
                 return
 
-        self.kwargs[color_key] = [
-            '#%02x%02x%02x' % (int(r*255), int(g*255), int(b*255))\
-            for r, g, b in sns.color_palette(discrete_palette, n_colors=nb_of_colors)
-        ]
+        self.kwargs[color_key] = utils.color_palette(nb_of_colors)
+
+    def fit_budget(self, fig):
+        """
+        Degrades the traces of fig to fit the output budget of the object (max_bytes and
+        max_points, see utils.apply_budget). What was degraded is listed in budget_report.
+        """
+        if self.max_bytes is None and self.max_points is None:
+            return fig
+
+        self.budget_report = utils.apply_budget(fig.data, self.max_bytes, self.max_points)
+        if self.budget_report:
+            warnings.warn(f"The figure exceeded its output budget: {len(self.budget_report)} trace(s) were degraded (see budget_report).")
+        return fig
 
     @property
     def fig(self):   
         if self.needs_resample:
             warnings.warn("Data was too large and had to be downsampled using plotly-resampler.")
-            return make_grid([[0]], [[(self, {})]]).fig
-        return self.__px__()    
+            return make_grid([[0]], [[(self, {})]], resampling=self.resampling, latency_log=self.latency_log).fig
+        obj = self.copy()
+        obj.prepare(utils.column_scans())
+        return self.fit_budget(obj.__px__())
+
+    async def afig(self, executor=None, timeout=None):
+        """
+        Builds the figure in an executor (see utils.run_async), the build can be cancelled
+        or given a timeout.
+        """
+        return await utils.run_async(lambda: self.fig, executor, timeout)
+
+    async def ato_json(self, executor=None, timeout=None):
+        """
+        Builds and serializes the figure in an executor (see utils.run_async).
+        """
+        return await utils.run_async(lambda: self.fig.to_json(), executor, timeout)
         
     def show(self):
         self.fig.show()
 
+    def _repr_mimebundle_(self, include=None, exclude=None):
+        # The figure is built once, the first time the object is displayed
+        if self._repr_fig is None:
+            self._repr_fig = self.fig
+        return utils.figure_mimebundle(self._repr_fig, repr(self), include, exclude)
+
     def __repr__(self):
-        self.show(); return ''
+        return f"{type(self).__name__}(x={self.x_axis!r}, y={self.y_axis!r}, points={self.nb_points})"
 
 
 class plot2d(draw):
@@ -494,14 +839,19 @@ class plot2d(draw):
 
     Attributes
     ----------
-    + df: DataFrame
-        A dataframe that contains columns that will be used in the generated plot.
+    + df: DataFrame|str
+        A dataframe that contains columns that will be used in the generated plot. It can
+        also be the path of a Parquet file (only the used columns are read) or of a .npy
+        file (opened as a read-only memory map).
     + x: str|array
         Either a string that represents a column in a dataframe (if a dataframe is used)
-        or an array containing the data that should be uses as x-axis
-    + y: str|array
+        or an array containing the data that should be uses as x-axis (np.memmap arrays and
+        .npy paths are kept memory-mapped)
+    + y: str|list|array
         Either a string that represents a column in a dataframe (if a dataframe is used)
-        or an array containing the data that should be uses as y-axis
+        or an array containing the data that should be uses as y-axis (np.memmap arrays and
+        .npy paths are kept memory-mapped). It can also be a list of columns (wide form),
+        each drawn as its own series against the same x.
     + color: str
         A string representing a column in a dataframe (the df argument should therefore be given)
         that will color the data with respect to the elements of the color column.
@@ -511,6 +861,16 @@ class plot2d(draw):
         A string namming the y-axis in the plot
     + title: str
         A title for the plot
+    + weak_df: bool
+        (keyword argument) If true, the object only holds a weak reference to the dataframe
+        instead of a copy of the columns it uses. The caller is then responsible for keeping
+        the dataframe alive until the figure is built.
+    + resampling: utils.resampling
+        (keyword argument) The resampling policy of the object.
+    + max_bytes / max_points: int
+        (keyword arguments) An output budget for the figure (see make_grid).
+    + latency_log: latency.latency_log
+        (keyword argument) Records the cost of the relayouts of the resampled figure (see make_grid).
     
     Methods
     -------
@@ -521,20 +881,55 @@ class plot2d(draw):
     """
     args_type = "df x y c"
     default_x_axis, default_y_axis = "x", "y"
+    # Objects drawing a list of y columns (or every column) without melting the dataframe
+    wide_form = False
+    # (method, options) of the objects drawing trendlines, and the fitted lines (group -> (x, y))
+    trendline = None
+    trends = {}
+
+
+    @property
+    def df(self):
+        if isinstance(self._df, weakref.ref):
+            df = self._df()
+            if df is None:
+                raise RuntimeError("The dataframe weakly referenced by this object was garbage collected.")
+            return df
+        return self._df
+
+    @df.setter
+    def df(self, df):
+        self._df = df
 
 
-    def _init_from_dataframe(self, df, x, y, color, x_axis, y_axis):
+    def _init_from_dataframe(self, df, x, y, color, x_axis, y_axis, weak_df=False):
         """
         A function called when the first argument passed to plot2d is of type
         DataFrame.
 
         Initializes self.df, self.x, self.y, color, self.x_axis and self.y_axis.
+        Only the columns used by the plot are kept (or a weak reference to df
+        when weak_df is true) so the object does not pin the whole dataframe.
         """
+        if x is None and y is None and self.wide_form:
+            y = list(df.columns)
+
         if x is not None: utils.str_assertion(x, "'x' argument", "When using a dataframe")
-        if y is not None: utils.str_assertion(y, "'y' argument", "When using a dataframe")
+        if isinstance(y, list):
+            for column in y: utils.str_assertion(column, "'y' columns", "When using a dataframe")
+            if color is not None:
+                raise ValueError("The 'color' argument cannot be used with a list of y columns (each column has its own color).")
+        elif y is not None: utils.str_assertion(y, "'y' argument", "When using a dataframe")
         if color is not None: utils.str_assertion(color, "'color' argument", "When using a dataframe")
 
-        self.df = df
+        if weak_df:
+            self.df = weakref.ref(df)
+        elif x is None and y is None:
+            # wide form: every column is used
+            self.df = df
+        else:
+            self.df = utils.project_columns(df, x, y, color)
+            self.source = (utils.source_keys(df, self.df), weakref.ref(self.df))
         self.x, self.y, self.color = x, y, color
         self.x_axis = x_axis if x_axis else self.default_x_axis if x is None or not isinstance(x, str) else x
         self.y_axis = y_axis if y_axis else self.default_y_axis if y is None or not isinstance(y, str) else y
@@ -551,7 +946,7 @@ class plot2d(draw):
         if color is not None and not isinstance(color, str): utils.itt_assertion(color, "'color' argument")
 
         if color is not None:
-            self.df = pandas.DataFrame({"x": x, "y": y, "color": color})
+            self.df = pandas.DataFrame({"x": x, "y": y, "color": color}, copy=False)
             self.x, self.y, self.color = "x", "y", "color"
         else:
             self.df, self.x, self.y, self.color = None, x, y, color
@@ -560,13 +955,32 @@ class plot2d(draw):
         self.y_axis = y_axis if y_axis else self.default_y_axis
 
 
+    def pop_options(self):
+        """
+        Removes the wraplotly options from the keyword arguments (the other ones are passed to plotly).
+        """
+        self.resampling = utils.resampling_assertion(self.kwargs.pop("resampling", None), type(self).__name__)
+        self.max_bytes = self.kwargs.pop("max_bytes", None)
+        self.max_points = self.kwargs.pop("max_points", None)
+        self.latency_log = self.kwargs.pop("latency_log", None)
+        return self.kwargs.pop("weak_df", False)
+
+
     def __init__(self, df, x, y, color, x_axis, y_axis, title):
+        weak_df = self.pop_options()
+
+        # Files are opened lazily: .npy files as memory maps, Parquet files restricted to the used columns
+        if utils.is_path(df):
+            df = utils.load_path(df, [x, y, color])
+        elif df is None:
+            x = utils.load_path(x) if utils.is_path(x) else x
+            y = utils.load_path(y) if utils.is_path(y) else y
+
         if isinstance(df, pandas.core.frame.DataFrame):
-            self._init_from_dataframe(df, x, y, color, x_axis, y_axis)
-            utils.count_nans_in_df_and_alert(self.df, self.x, self.y)
+            self._init_from_dataframe(df, x, y, color, x_axis, y_axis, weak_df)
         elif df is not None:
             if x is None:
-                self._init_from_array(list(range(len(df))), df, color, x_axis, y_axis)
+                self._init_from_array(pandas.RangeIndex(len(df)), df, color, x_axis, y_axis)
             else:
                 self._init_from_array(df, x, color, x_axis, y_axis)
             utils.count_nans_and_alert(self.x, self.y)
@@ -574,17 +988,168 @@ class plot2d(draw):
             self._init_from_array(x, y, color, x_axis, y_axis)
             utils.count_nans_and_alert(self.x, self.y)
         elif x is not None:
-            self._init_from_array(x, list(range(len(x))), color, x_axis, y_axis)
+            self._init_from_array(x, pandas.RangeIndex(len(x)), color, x_axis, y_axis)
             utils.count_nans_and_alert(self.x, self.y)
         elif y is not None:
-            self._init_from_array(list(range(len(y))), y, color, x_axis, y_axis)
+            self._init_from_array(pandas.RangeIndex(len(y)), y, color, x_axis, y_axis)
             utils.count_nans_and_alert(self.x, self.y)
         else:
             raise ValueError(f"Too many arguments without a dataframe: '{df}', '{x}', '{y}'.")
         
         self.title = title
-        self.needs_resample = utils.needs_resample(self.df, self.x, self.y)
+        self.nb_points = utils.count_points(self.df, self.x, self.y)
+
 
+    def prepare(self, scans):
+        if self.scans is not None:
+            return
+        super().prepare(scans)
+        if self.df is not None:
+            utils.count_nans_in_df_and_alert(self.df, self.x, self.y, scans=scans)
+        if self.trendline is not None:
+            self.fit_trendlines()
+
+
+    def set_trendline(self, trendline, trendline_options=None):
+        """
+        Validates the trendline of the object (see utils.trendlines), which is fitted when the
+        figure is built.
+        """
+        if trendline is None:
+            return
+        if trendline not in utils.TRENDLINES:
+            raise ValueError(f"Unknown trendline '{trendline}' (expected one of {list(utils.TRENDLINES)}).")
+        if self.wide:
+            raise ValueError("Trendlines cannot be used with a list of y columns.")
+        self.trendline = (trendline, dict(trendline_options or {}))
+
+
+    def fit_trendlines(self):
+        """
+        Fits the trendlines of every color group at once, from the factorized color column
+        (see utils.trendlines). They are stored in self.trends like the bands of lines.
+
+        Continuous colors (numeric columns with more than min_objects_until_heatmap values,
+        drawn on a color scale) have a single trendline.
+        """
+        method, options = self.trendline
+        if self.df is not None:
+            x = self.df[self.x] if self.x is not None else self.df.index
+            y = self.df[self.y]
+            scan = self.scan(self.df[self.color]) if self.color is not None else None
+            if scan is not None and self.continuous_color(scan):
+                scan = None
+        else:
+            x, y, scan = self.x, self.y, None
+
+        trends = utils.trendlines(x, y, scan.codes if scan is not None else None, method, options)
+        self.trends = {(scan.uniques[code] if scan is not None else None): trend for code, trend in trends.items()}
+
+
+    def continuous_color(self, scan):
+        """
+        Returns True if the color column (of scan) is drawn on a color scale in arrangements.
+        """
+        values = self.df[self.color]
+        return (
+            self.use_heatmaps and scan.nunique > utils.get_option("min_objects_until_heatmap")
+            and pandas.api.types.is_numeric_dtype(values) and not pandas.api.types.is_bool_dtype(values)
+        )
+
+
+    def __trend__(self, name, color):
+        """
+        Returns the trace of the trendline of a group (or None if it has none).
+        """
+        trend = self.trends[name] if name in self.trends else self.trends.get(None)
+        if trend is None:
+            return None
+        label = self.trendline[0] if name is None or name == "" else f"{name} ({self.trendline[0]})"
+        return go.Scatter(
+            x=trend[0], y=trend[1], mode="lines", name=label, showlegend=False, legendgroup="1",
+            line=dict(color=color if isinstance(color, str) else None)
+        )
+
+
+    def add_trends(self, fig, color_of):
+        """
+        Adds the trendlines to a plotly express figure, matching its traces by name.
+        """
+        trends = {str(group) if group is not None else "": group for group in self.trends}
+        for trace in list(fig.data):
+            if trace.name in trends:
+                fig.add_trace(self.__trend__(trends[trace.name], color_of(trace)))
+            elif trace.name == "":
+                # plotly express draws numeric colors on a color scale even with few groups
+                for group in self.trends:
+                    fig.add_trace(self.__trend__(group, None))
+        return fig
+
+
+    @property
+    def wide(self):
+        # Lists of y columns only exist with a dataframe (without, a list is the data itself)
+        return isinstance(self.y, list) and self.df is not None
+
+    def wide_fig(self):
+        """
+        Builds the figure of a wide form object as a one cell grid: one trace per y column,
+        all sharing the same x buffer (plotly express would melt the dataframe to long form,
+        which copies the x-axis and the values once per column).
+        """
+        fig = make_grid([[0]], [[(self, {})]], resampling=self.resampling, max_bytes=self.max_bytes, max_points=self.max_points, latency_log=self.latency_log).fig
+        return fig.update_layout(title=self.title)
+
+    def sample(self, size, scans=None):
+        """
+        Returns a copy of the object drawing a random sample of about size points, stratified
+        on the color groups (see utils.stratified_sample) so that rare groups stay visible, or
+        the object itself if it is not larger.
+        """
+        if self.nb_points <= size:
+            return self
+
+        obj = self.copy()
+        rng = np.random.default_rng(0)
+        if self.df is not None:
+            nb_rows = size // len(self.y) if self.wide else size
+            if self.color is not None and self.color in self.df:
+                codes = (scans if scans is not None else utils.column_scans()).scan(self.df[self.color]).codes
+                rows = utils.stratified_sample(codes, nb_rows)
+            else:
+                rows = np.sort(rng.choice(len(self.df), min(nb_rows, len(self.df)), replace=False))
+            obj.df = self.df.take(rows)
+        else:
+            length = max(len(arg) for arg in (self.x, self.y) if arg is not None)
+            rows = np.sort(rng.choice(length, size, replace=False))
+            take = lambda arg: arg.take(rows) if isinstance(arg, (pandas.Index, pandas.Series)) else np.asarray(arg)[rows]
+            obj.x = take(self.x) if self.x is not None else None
+            obj.y = take(self.y) if self.y is not None else None
+
+        obj.scans, obj._repr_fig = None, None
+        obj.nb_points = utils.count_points(obj.df, obj.x, obj.y)
+        return obj
+
+    def sort_x(self, resampled=None):
+        """
+        Returns a copy of the object sorted by x when it is resampled (or when resampled is
+        true, for the objects of a resampled arrangement): plotly-resampler rejects large
+        unsorted x-axes. The object itself is returned if its x-axis is already sorted.
+        """
+        resampled = self.needs_resample if resampled is None else resampled
+        x = (self.df[self.x] if self.x is not None else self.df.index) if self.df is not None else self.x
+        if not resampled or x is None or pandas.Index(x).is_monotonic_increasing:
+            return self
+
+        obj = self.copy()
+        order = np.argsort(np.asarray(x), kind="stable")
+        if self.df is not None:
+            obj.df = self.df.take(order)
+        else:
+            take = lambda arg: arg.take(order) if isinstance(arg, (pandas.Index, pandas.Series)) else np.asarray(arg)[order]
+            obj.x, obj.y = take(self.x), take(self.y) if self.y is not None else None
+        obj.scans, obj._repr_fig = None, None
+        return obj
 
     def __color__(self, color):
         raise RuntimeError("__color__ was not defined.")
@@ -0,0 +1,193 @@
+"""
+Persistent cache of the figures built by wraplotly objects.
+"""
+import os
+import zlib
+import types
+import pandas
+import datetime
+import hashlib
+import plotly
+import weakref
+import numpy as np
+import plotly.io as pio
+import plotly.graph_objects as go
+from plotly.basedatatypes import BaseFigure
+import wraplotly
+from wraplotly import utils
+
+
+class figure_cache:
+    """
+    A disk cache of the figures built by wraplotly objects (any draw object or arrangement).
+
+    Figures are keyed by a hash of the data and parameters of the object and of the wraplotly
+    and plotly versions. They are stored as compressed plotly JSON (numpy arrays are written
+    as typed arrays by plotly) and the least recently used figures are evicted once the cache
+    is larger than max_bytes. Interactive figures (plotly-resampler widgets) are not cached.
+
+    Usage:
+    > cache = figure_cache("~/.cache/wraplotly", max_bytes=500_000_000)
+    > fig = cache(wp.line(df, "date", "value"))
+
+    Attributes
+    ----------
+    + path: str
+        The directory where figures are stored.
+    + max_bytes: int
+        The maximum size of the cache on disk.
+    + hits: int
+        The number of figures loaded from the cache.
+    + misses: int
+        The number of figures that had to be built.
+
+    Methods
+    -------
+    + __call__(obj):
+        Returns the figure of obj, from the cache if possible
+    + key(obj):
+        Returns the cache key of obj
+    + clear:
+        Removes every cached figure
+    """
+    extension = ".json.z"
+    # The options that change how the figure is built, not the figure itself
+    build_options = ("executor", "workers")
+    # The state of the objects that does not change their figure (and differs between processes)
+    runtime = ("_repr_fig", "scans", "source", "rng", "lock", "budget_report", "latency_log")
+    # The values whose representation only depends on the value itself
+    literals = (
+        type(None), bool, int, float, complex, str, bytes, range, slice, np.generic, np.dtype,
+        pandas.api.extensions.ExtensionDtype, datetime.date, datetime.time, datetime.timedelta,
+    )
+
+    def __init__(self, path, max_bytes=1 << 30):
+        self.path = os.path.expanduser(path)
+        self.max_bytes = max_bytes
+        self.hits, self.misses = 0, 0
+        os.makedirs(self.path, exist_ok=True)
+
+    def key(self, obj):
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"wraplotly {wraplotly.__version__} plotly {plotly.__version__}".encode())
+        # The options read when the figure is built (palettes, thresholds) change the figure too
+        self.update_digest(digest, {option: utils.get_option(option) for option in utils.options_defaults if option not in self.build_options}, set())
+        self.update_digest(digest, obj, set())
+        return digest.hexdigest()
+
+    def update_digest(self, digest, value, seen):
+        """
+        Feeds value to the digest: arrays and dataframes by their content, wraplotly objects
+        by their attributes (without their runtime state, like the random generator of a
+        sketch, which is then hashed by its levels) and literals by their representation.
+        Other values raise a TypeError, their representation may differ between processes.
+        """
+        if isinstance(value, weakref.ref):
+            value = value()
+
+        if isinstance(value, BaseFigure):
+            return
+
+        if isinstance(value, (pandas.DataFrame, pandas.Series, pandas.Index)):
+            digest.update(f"{type(value).__name__} {getattr(value, 'columns', getattr(value, 'name', None))!r} {getattr(value, 'dtypes', getattr(value, 'dtype', None))!r}".encode())
+            try:
+                digest.update(pandas.util.hash_pandas_object(value, index=not isinstance(value, pandas.Index)).to_numpy().data)
+            except TypeError:
+                self.update_digest(digest, value.to_dict() if hasattr(value, "to_dict") else list(value), seen)
+        elif isinstance(value, np.ndarray):
+            digest.update(f"ndarray {value.dtype} {value.shape}".encode())
+            if value.dtype == object:
+                self.update_digest(digest, pandas.Series(value.ravel()), seen)
+            else:
+                digest.update(np.ascontiguousarray(value).data)
+        elif isinstance(value, (list, tuple)):
+            # Long lists of numbers are hashed as arrays
+            try:
+                array = np.asarray(value) if len(value) >= 16 else None
+            except ValueError:
+                array = None
+            if array is not None and array.dtype != object:
+                self.update_digest(digest, array, seen)
+            else:
+                digest.update(f"{type(value).__name__} {len(value)}".encode())
+                for item in value:
+                    self.update_digest(digest, item, seen)
+        elif isinstance(value, (set, frozenset)):
+            # The order of a set depends on the hashes of its items, which are salted per process
+            self.update_digest(digest, sorted(value, key=repr), seen)
+        elif isinstance(value, dict):
+            for key in sorted(value, key=repr):
+                self.update_digest(digest, key, seen)
+                self.update_digest(digest, value[key], seen)
+        elif isinstance(value, (types.FunctionType, types.BuiltinFunctionType, np.ufunc, type)):
+            digest.update(f"{getattr(value, '__module__', '')}.{getattr(value, '__qualname__', value.__name__)}".encode())
+        elif hasattr(value, "__dict__") and not isinstance(value, types.ModuleType):
+            if id(value) in seen:
+                return
+            seen.add(id(value))
+            digest.update(type(value).__qualname__.encode())
+            self.update_digest(digest, {key: item for key, item in vars(value).items() if key not in self.runtime}, seen)
+        elif isinstance(value, self.literals):
+            digest.update(f"{type(value).__name__} {value!r}".encode())
+        else:
+            raise TypeError(f"Cannot cache a figure depending on a {type(value).__name__}: it cannot be hashed the same way in every process.")
+
+    def file(self, key):
+        return os.path.join(self.path, key + self.extension)
+
+    def __call__(self, obj):
+        key = self.key(obj)
+        path = self.file(key)
+
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                fig = pio.from_json(zlib.decompress(f.read()).decode())
+            os.utime(path)
+            self.hits += 1
+            return fig
+
+        self.misses += 1
+        fig = obj.fig
+
+        if not isinstance(fig, go.FigureWidget):
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(zlib.compress(fig.to_json().encode()))
+            os.replace(tmp, path)
+            self.evict()
+
+        return fig
+
+    def entries(self):
+        """
+        Returns the (last access time, size, path) of every cached figure.
+        """
+        entries = []
+        for name in os.listdir(self.path):
+            if name.endswith(self.extension):
+                stat = os.stat(os.path.join(self.path, name))
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(self.path, name)))
+        return entries
+
+    def evict(self):
+        """
+        Removes the least recently used figures until the cache fits in max_bytes.
+        """
+        entries = sorted(self.entries())
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, path in entries:
+            if size <= self.max_bytes:
+                break
+            os.remove(path)
+            size -= entry_size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
+
+    @property
+    def size(self):
+        return sum(entry[1] for entry in self.entries())
+
+    def __repr__(self):
+        return f"figure_cache('{self.path}', hits={self.hits}, misses={self.misses}, size={self.size})"
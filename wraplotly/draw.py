@@ -1,11 +1,12 @@
 import pandas
 import warnings
+import weakref
+import collections.abc
 import numpy as np
-import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
-import plotly.figure_factory as ff
-from wraplotly import base, utils, discrete_palette, continuous_palette
+from concurrent.futures import ThreadPoolExecutor
+from wraplotly import base, utils, sketch
 
 
 class scatter(base.plot2d):
@@ -21,7 +22,13 @@ class scatter(base.plot2d):
         will be used as the x-axis data.
     + y : str|list
         Either a string specifying which column of self.df should be used as y-axis or a list that
-        will be used as the y-axis data.
+        will be used as the y-axis data. A list of columns (or no x and y at all) draws one series
+        per column against the same x, without melting the dataframe.
+    + aggregate : str
+        If "hex" or "grid", the points are binned in cells (see hexbin) instead of being drawn.
+    + trendline : str
+        If given ("ols", "rolling", "lowess" or "ewm"), a trendline is drawn for every color group
+        (see utils.trendlines, trendline_options are passed to it).
 
     Methods
     -------
@@ -32,24 +39,40 @@ class scatter(base.plot2d):
     """
     name = "Scatter"
     use_heatmaps = True
-
-
-    def __init__(self, df=None, x=None, y=None, color=None, x_axis=None, y_axis=None, title=None, colorscale=None, **kwargs):
+    wide_form = True
+
+    def __new__(cls, df=None, x=None, y=None, color=None, x_axis=None, y_axis=None, title=None, colorscale=None, aggregate=None, trendline=None, trendline_options=None, **kwargs):
+        # scatter(..., aggregate="hex"|"grid") bins the points instead of drawing them
+        # (the color column is then the one reduced in each cell)
+        if aggregate is not None:
+            if trendline is not None:
+                raise ValueError("Trendlines cannot be used with aggregate (the points are binned, draw the trendline with a scatter or a line).")
+            return hexbin(df, x, y, color, x_axis, y_axis, title, kind=aggregate, colorscale=colorscale, **kwargs)
+        return super().__new__(cls)
+
+    def __init__(self, df=None, x=None, y=None, color=None, x_axis=None, y_axis=None, title=None, colorscale=None, aggregate=None, trendline=None, trendline_options=None, **kwargs):
         self.kwargs = kwargs
-        self.colorscale = colorscale if colorscale else continuous_palette
+        self.colorscale = colorscale
         super().__init__(df, x, y, color, x_axis, y_axis, title)
+        self.set_trendline(trendline, trendline_options)
 
     def __px__(self):
+        if self.wide:
+            return self.wide_fig()
         self.set_color_discrete_sequence()
-        return px.scatter(data_frame=self.df, x=self.x, y=self.y, color=self.color, title=self.title, **self.kwargs)
+        fig = px.scatter(data_frame=self.df, x=self.x, y=self.y, color=self.color, title=self.title, **self.kwargs)
+        return self.add_trends(fig, lambda trace: trace.marker.color)
 
     def __color__(self, color, name):
-        if isinstance(color, list):
-            return dict(marker=dict(color=color, colorbar=dict(title=name), colorscale=self.colorscale))
+        if isinstance(color, np.ndarray):
+            # continuous colors share the coloraxis of the grid
+            return dict(marker=dict(color=color, coloraxis="coloraxis"))
         return dict(marker=dict(color=color))
 
     def __go__(self, x, y, color=None, name=None, show_name=None, row=None):
-        return go.Scatter(x=x, y=y, mode="markers", **self.__color_args__(color, name, show_name, row), **self.kwargs)
+        go_object = go.Scatter(x=x, y=y, mode="markers", **self.__color_args__(color, name, show_name, row), **self.kwargs)
+        trend = self.__trend__(name, color)
+        return go_object if trend is None else [go_object, trend]
 
 
 class line(base.plot2d):
@@ -65,7 +88,17 @@ class line(base.plot2d):
         will be used as the x-axis data.
     + y : str|list
         Either a string specifying which column of self.df should be used as y-axis or a list that
-        will be used as the y-axis data.
+        will be used as the y-axis data. A list of columns (or no x and y at all) draws one series
+        per column against the same x, without melting the dataframe.
+    + bucket : str|number
+        If given, the data is aggregated in buckets of this width before being plotted. A string
+        (like "1min") or a pandas.Timedelta is used for datetime x-axis, a number for numeric ones.
+    + agg : str|list
+        The aggregations computed in each bucket (default: ["mean", "min", "max"]). The first one is
+        drawn as the line, "min" and "max" (when both given) are drawn as a band around it.
+    + trendline : str
+        If given ("ols", "rolling", "lowess" or "ewm"), a trendline is drawn for every color group
+        (see utils.trendlines, trendline_options are passed to it).
 
     Methods
     -------
@@ -75,23 +108,135 @@ class line(base.plot2d):
         Shows the figure
     """
     name = "Line"
+    wide_form = True
 
-    def __init__(self, df=None, x=None, y=None, color=None, x_axis=None, y_axis=None, title=None, **kwargs):
+    def __init__(self, df=None, x=None, y=None, color=None, x_axis=None, y_axis=None, title=None, bucket=None, agg=None, trendline=None, trendline_options=None, **kwargs):
         self.kwargs = kwargs
+        self.bands = {}
         super().__init__(df, x, y, color, x_axis, y_axis, title)
+        self.set_trendline(trendline, trendline_options)
+
+        if bucket is not None:
+            if self.wide:
+                raise ValueError("Buckets cannot be used with a list of y columns.")
+            self.bucketize(bucket, agg)
+
+    def bucketize(self, bucket, agg):
+        """
+        Replaces the data of the object by its aggregation over buckets of width 'bucket'.
+
+        Every color group is aggregated at once by reducing over a composite
+        (group, bucket) key computed on the int64 representation of x, one chunk
+        of rows at a time.
+        """
+        agg = [agg] if isinstance(agg, str) else list(agg) if agg else ["mean", "min", "max"]
+        reducers = list(dict.fromkeys(agg + ["min", "max"])) if "min" in agg[1:] and "max" in agg[1:] else agg[:1]
+
+        if self.df is not None:
+            x = self.df[self.x] if self.x is not None else self.df.index
+            y, groups = self.df[self.y], self.df[self.color] if self.color is not None else None
+        else:
+            x, y, groups = self.x, self.y, None
+
+        is_datetime = isinstance(bucket, (str, pandas.Timedelta))
+        width = pandas.Timedelta(bucket).value if is_datetime else bucket
+        codes, uniques = pandas.factorize(groups) if groups is not None else (None, [None])
+        tz = None
+
+        def buckets_of(xs, ys, cs):
+            # Bucket and value of the valid points of a chunk
+            nonlocal tz
+            if is_datetime:
+                xs = pandas.DatetimeIndex(xs).as_unit("ns")
+                tz, x_int = xs.tz, xs.asi8
+                keep = x_int != pandas.NaT.value
+            else:
+                x_int = np.asarray(xs, dtype=float)
+                keep = ~np.isnan(x_int)
+            ys = np.asarray(ys, dtype=float)
+            keep &= ~np.isnan(ys) & (cs >= 0 if cs is not None else True)
+            return np.floor_divide(x_int[keep], width).astype(np.int64), ys[keep], cs[keep] if cs is not None else None
+
+        # The data (possibly memory-mapped) is read CHUNK_SIZE rows at a time, so only
+        # the partial reductions of each chunk are kept in memory
+        chunks = utils.chunk_slices(x, y, codes)
+        offset, span = 0, 1
+        if groups is not None:
+            # A first pass finds the range of the buckets to build composite (group, bucket) keys
+            bounds = [(b.min(), b.max()) for b, _, _ in (buckets_of(*chunk) for chunk in chunks) if len(b)]
+            if bounds:
+                offset = min(low for low, _ in bounds)
+                span = max(high for _, high in bounds) - offset + 1
+
+        def keyed_chunks():
+            for chunk in chunks:
+                buckets, values, cs = buckets_of(*chunk)
+                yield (cs * span + (buckets - offset) if cs is not None else buckets), values
+
+        keys, reduced = utils.reduce_chunks_by_key(keyed_chunks(), reducers)
+        if groups is not None:
+            group_codes, buckets = keys // span, keys % span + offset
+        else:
+            group_codes, buckets = np.zeros(len(keys), dtype=np.int64), keys
+
+        if is_datetime:
+            bucket_x = pandas.to_datetime(buckets * width, unit="ns", utc=tz is not None)
+            bucket_x = bucket_x.tz_convert(tz) if tz is not None else bucket_x
+        else:
+            bucket_x = buckets * width
+
+        x_name = self.x if isinstance(self.x, str) else "x"
+        y_name = self.y if isinstance(self.y, str) else "y"
+        data = {x_name: bucket_x, y_name: reduced[agg[0]]}
+        if groups is not None:
+            data[self.color] = np.asarray(uniques, dtype=object)[group_codes]
+
+        self.df = pandas.DataFrame(data)
+        self.x, self.y = x_name, y_name
+
+        if "min" in reduced and "max" in reduced and len(reducers) > 1:
+            for code, group in enumerate(uniques):
+                mask = group_codes == code
+                self.bands[group] = (bucket_x[mask], reduced["min"][mask], reduced["max"][mask])
+
+        self.nb_points = utils.count_points(self.df, self.x, self.y)
+
+    def __bands__(self, x, low, high, color):
+        """
+        Returns the two traces drawing a band between low and high (the second one fills to the first).
+        """
+        return [
+            go.Scatter(x=x, y=high, mode="lines", line=dict(width=0, color=color), showlegend=False, hoverinfo="skip", legendgroup="1"),
+            go.Scatter(x=x, y=low, mode="lines", line=dict(width=0, color=color), fill="tonexty", fillcolor=utils.hex_to_rgba(color, 0.2), showlegend=False, hoverinfo="skip", legendgroup="1"),
+        ]
 
     def __px__(self):
+        if self.wide:
+            return self.wide_fig()
         self.set_color_discrete_sequence()
-        return px.line(data_frame=self.df, x=self.x, y=self.y, color=self.color, title=self.title, **self.kwargs)
+        fig = px.line(data_frame=self.df, x=self.x, y=self.y, color=self.color, title=self.title, **self.kwargs)
+
+        bands = {str(group) if group is not None else "": band for group, band in self.bands.items()}
+        for trace in list(fig.data):
+            if trace.name in bands:
+                color = trace.line.color if trace.line.color and trace.line.color.startswith("#") else None
+                fig.add_traces(self.__bands__(*bands[trace.name], color))
+
+        return self.add_trends(fig, lambda trace: trace.line.color)
 
     def __color__(self, color, name):
         return dict(marker=dict(color=color))
 
     def __go__(self, x, y, color=None, name=None, show_name=None, row=None):
         if "mode" in self.kwargs:
-            return go.Scatter(x=x, y=y, **self.__color_args__(color, name, show_name, row), **self.kwargs)
+            go_object = go.Scatter(x=x, y=y, **self.__color_args__(color, name, show_name, row), **self.kwargs)
         else:
-            return go.Scatter(x=x, y=y, mode="lines", **self.__color_args__(color, name, show_name, row), **self.kwargs)
+            go_object = go.Scatter(x=x, y=y, mode="lines", **self.__color_args__(color, name, show_name, row), **self.kwargs)
+
+        band = self.bands[name] if name in self.bands else self.bands.get(None)
+        trend = self.__trend__(name, color)
+        traces = (self.__bands__(*band, color) if band is not None else []) + [go_object] + ([trend] if trend is not None else [])
+        return traces if len(traces) > 1 else go_object
 
 
 class bar(base.plot2d):
@@ -108,6 +253,9 @@ class bar(base.plot2d):
     + y : str|list
         Either a string specifying which column of self.df should be used as y-axis or a list that
         will be used as the y-axis data.
+    + agg : str
+        If given ("sum", "mean" or "count"), the rows are aggregated in one value per bar (per x
+        and color) before the traces are built.
 
     Methods
     -------
@@ -118,10 +266,41 @@ class bar(base.plot2d):
     """
     name = "Bar"
 
-    def __init__(self, df=None, x=None, y=None, color=None, x_axis=None, y_axis=None, title=None, **kwargs):
+    def __init__(self, df=None, x=None, y=None, color=None, x_axis=None, y_axis=None, title=None, agg=None, **kwargs):
         self.kwargs = kwargs
         super().__init__(df, x, y, color, x_axis, y_axis, title)
 
+        if agg is not None:
+            self.aggregate(agg)
+            self.y_axis = y_axis if y_axis else agg if agg == "count" else f"{agg} of {self.y_axis}"
+
+    def aggregate(self, agg):
+        """
+        Replaces the rows of the object by one row per bar with a single groupby over x (and
+        color), in the order of appearance of the categories.
+        """
+        if agg not in ("sum", "mean", "count"):
+            raise ValueError(f"Unknown aggregation '{agg}' (expected one of 'sum', 'mean', 'count').")
+
+        if self.df is None:
+            self.df = pandas.DataFrame({"x": self.x, "y": self.y}, copy=False)
+            self.x, self.y = "x", "y"
+
+        x_name = self.x if isinstance(self.x, str) else "x"
+        y_name = self.y if isinstance(self.y, str) else agg
+        keys = [self.df[self.x] if self.x is not None else self.df.index.rename(x_name)]
+        # Coloring the bars by their own category groups by x only (the x column is the color column)
+        keys += [self.df[self.color]] if self.color is not None and self.color != self.x else []
+
+        if agg == "count":
+            grouped = self.df.groupby(keys, sort=False, observed=True, dropna=False).size()
+        else:
+            grouped = self.df[self.y].groupby(keys, sort=False, observed=True, dropna=False).agg(agg)
+
+        self.df = grouped.rename(y_name).reset_index()
+        self.x, self.y = x_name, y_name
+        self.nb_points = utils.count_points(self.df, self.x, self.y)
+
     def __px__(self):
         self.set_color_discrete_sequence()
         return px.bar(data_frame=self.df, x=self.x, y=self.y, color=self.color, title=self.title, **self.kwargs)
@@ -237,18 +416,26 @@ class histogram(base.plot2d):
         user_defined_y_axis = y_axis is not None
         y_axis = f"{self.histfunc} of {y}" if isinstance(y, str) and not user_defined_y_axis else None     
         super().__init__(df, x, y, color, x_axis, y_axis, title)
+        # The orientation depends on the data, it is decided when the figure is built (see prepare)
+        self.user_defined_axes = (x_axis is not None, user_defined_y_axis)
+
+    def prepare(self, scans):
+        if self.scans is not None:
+            return
+        super().prepare(scans)
 
         if self.histfunc == "count":
-            if isinstance(df, pandas.core.frame.DataFrame):
-                x_cnt = len(set(self.df[self.x])) if self.x is not None else None
-                y_cnt = len(set(self.df[self.y])) if self.y is not None else None
+            if isinstance(self.df, pandas.core.frame.DataFrame):
+                x_cnt = self.scan(self.df[self.x]).nunique if self.x is not None else None
+                y_cnt = self.scan(self.df[self.y]).nunique if self.y is not None else None
             else:
-                x_cnt = len(set(self.x)) if self.x is not None else None
-                y_cnt = len(set(self.y)) if self.y is not None else None
+                x_cnt = self.scan(self.x).nunique if self.x is not None else None
+                y_cnt = self.scan(self.y).nunique if self.y is not None else None
 
             if x_cnt and y_cnt and x_cnt > y_cnt:
-                self.x_axis = f"{self.histfunc} of {x}" if x is not None and isinstance(x, str) and x_axis is None else None
-                self.y_axis = y if y is not None and isinstance(y, str) and not user_defined_y_axis else None
+                user_defined_x_axis, user_defined_y_axis = self.user_defined_axes
+                self.x_axis = f"{self.histfunc} of {self.x}" if isinstance(self.x, str) and not user_defined_x_axis else None
+                self.y_axis = self.y if isinstance(self.y, str) and not user_defined_y_axis else None
                 self.orientation = 'h'
 
     def __px__(self):
@@ -299,18 +486,424 @@ class density_heatmap(base.plot2d):
         return go.Histogram2d(x=x, y=y, **self.kwargs)
 
 
+class hexbin(base.plot2d):
+    """
+    A class binning dense point clouds in hexagonal (kind="hex") or square (kind="grid") cells and
+    drawing a single trace: a plotly graph_objects' Scatter with hexagon markers or a Heatmap.
+
+    Attributes
+    ----------
+    + df : pandas.DataFrame|iterable|str
+        A DataFrame containing the columns to bin. It can also be chunked input: an iterator of
+        DataFrames (or of (x, y[, values]) tuples), a list of DataFrames or the path of a Parquet
+        file, binned one chunk at a time. Arrays (like np.memmap) are also binned by chunks.
+    + x : str|list
+        Either a string specifying which column of self.df should be used as x-axis or a list that
+        will be used as the x-axis data.
+    + y : str|list
+        Either a string specifying which column of self.df should be used as y-axis or a list that
+        will be used as the y-axis data.
+    + values : str|list
+        Optional column (or array) reduced in each cell. Without it, the points are counted.
+    + reducer : str|callable
+        "count", "sum", "mean", "min", "max" or a function reducing an array (not with chunked input).
+    + gridsize : int|tuple
+        The number of cells along the x-axis (or a (nx, ny) tuple for kind="grid").
+    + extent : tuple
+        (xmin, xmax, ymin, ymax) of the binned area. Required when chunks are given by an iterator.
+
+    Methods
+    -------
+    + fig (proprety):
+        Returns the plotly object associated with the object heriting from plot2d
+    + show:
+        Shows the figure
+    """
+    name = "Hexbin"
+    args_type = "df x y"
+    needs_resample = False
+
+    def __init__(self, df=None, x=None, y=None, values=None, x_axis=None, y_axis=None, title=None, kind="hex", gridsize=50, reducer="count", extent=None, colorscale=None, **kwargs):
+        if kind not in ("hex", "grid"):
+            raise ValueError(f"Unknown hexbin kind '{kind}' (expected 'hex' or 'grid').")
+
+        self.kwargs = kwargs
+        self.kind, self.reducer = kind, reducer
+        self.colorscale = colorscale
+        self.values_name = values if isinstance(values, str) else "values"
+
+        if utils.is_path(df, (".parquet", ".pq")):
+            # Parquet files are binned one batch of rows at a time
+            df = utils.parquet_chunks(df, [x, y, values])
+
+        if utils.is_chunked(df):
+            if callable(reducer):
+                raise ValueError("Custom reducers cannot be used with chunked input.")
+            self.pop_options()
+            self.df, self.color, self.title = None, None, title
+            self.x_axis = x_axis if x_axis else x if isinstance(x, str) else self.default_x_axis
+            self.y_axis = y_axis if y_axis else y if isinstance(y, str) else self.default_y_axis
+            if extent is None:
+                if isinstance(df, collections.abc.Iterator):
+                    raise ValueError("An extent is needed to bin chunks given by an iterator.")
+                extent = self.extent_of(utils.chunk_columns(chunk, x, y, values) for chunk in df)
+            chunks = (utils.chunk_columns(chunk, x, y, values) for chunk in df)
+        else:
+            super().__init__(df, x, y, values if isinstance(values, str) else None, x_axis, y_axis, title)
+            if self.df is not None:
+                xs = self.df[self.x] if self.x is not None else self.df.index
+                values = self.df[self.color] if self.color is not None else values
+                chunks = utils.chunk_slices(xs, self.df[self.y], values)
+            else:
+                chunks = utils.chunk_slices(self.x, self.y, values)
+            self.color = None
+
+        if extent is None:
+            extent = self.extent_of(chunks)
+
+        self.extent = extent
+        self.nx, self.ny = gridsize if isinstance(gridsize, tuple) else (gridsize, gridsize if kind == "grid" else max(1, int(gridsize / np.sqrt(3))))
+        self.bin(chunks)
+
+        # Only the binned cells are kept
+        self.df, self.nb_points = None, len(self.x)
+
+    @staticmethod
+    def extent_of(chunks):
+        bounds = np.array([
+            [np.nanmin(x), np.nanmax(x), np.nanmin(y), np.nanmax(y)]
+            for x, y in ((np.asarray(x, dtype=float), np.asarray(y, dtype=float)) for x, y, _ in chunks) if len(x)
+        ])
+        return bounds[:, 0].min(), bounds[:, 1].max(), bounds[:, 2].min(), bounds[:, 3].max()
+
+    def cells(self, x, y):
+        """
+        Returns the flat index of the cell of every point (-1 for points outside the extent).
+        """
+        xmin, xmax, ymin, ymax = self.extent
+        sx = (xmax - xmin) / self.nx or 1
+        sy = (ymax - ymin) / self.ny or 1
+        # The extent is tested in data units: the scaled extremes can round past nx or ny
+        inside = (x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax)
+        ix, iy = np.clip((x - xmin) / sx, 0, self.nx), np.clip((y - ymin) / sy, 0, self.ny)
+        ix, iy = np.where(inside, ix, 0), np.where(inside, iy, 0)
+
+        if self.kind == "grid":
+            cells = np.minimum(ix, self.nx - 1).astype(np.int64) * self.ny + np.minimum(iy, self.ny - 1).astype(np.int64)
+            return np.where(inside, cells, -1)
+
+        # Two interleaved lattices, each point goes to the closest center
+        ix1, iy1 = np.round(ix), np.round(iy)
+        ix2, iy2 = np.floor(ix), np.floor(iy)
+        d1 = (ix - ix1) ** 2 + 3 * (iy - iy1) ** 2
+        d2 = (ix - ix2 - 0.5) ** 2 + 3 * (iy - iy2 - 0.5) ** 2
+        ix2, iy2 = np.minimum(ix2, self.nx - 1), np.minimum(iy2, self.ny - 1)
+        cells = np.where(
+            d1 < d2,
+            ix1 * (self.ny + 1) + iy1,
+            (self.nx + 1) * (self.ny + 1) + ix2 * self.ny + iy2,
+        )
+        return np.where(inside, cells, -1).astype(np.int64)
+
+    def centers(self):
+        xmin, xmax, ymin, ymax = self.extent
+        sx, sy = (xmax - xmin) / self.nx, (ymax - ymin) / self.ny
+
+        if self.kind == "grid":
+            return xmin + (np.arange(self.nx) + 0.5) * sx, ymin + (np.arange(self.ny) + 0.5) * sy
+
+        i1, j1 = np.meshgrid(np.arange(self.nx + 1), np.arange(self.ny + 1), indexing="ij")
+        i2, j2 = np.meshgrid(np.arange(self.nx) + 0.5, np.arange(self.ny) + 0.5, indexing="ij")
+        return (
+            xmin + np.concatenate([i1.ravel(), i2.ravel()]) * sx,
+            ymin + np.concatenate([j1.ravel(), j2.ravel()]) * sy,
+        )
+
+    def bin(self, chunks):
+        """
+        Accumulates every chunk in dense per-cell arrays (mergeable between chunks), then
+        reduces them to one value per cell.
+        """
+        nb_cells = self.nx * self.ny if self.kind == "grid" else (self.nx + 1) * (self.ny + 1) + self.nx * self.ny
+        count, total = np.zeros(nb_cells), np.zeros(nb_cells)
+        low, high = np.full(nb_cells, np.inf), np.full(nb_cells, -np.inf)
+        reducer = self.reducer
+        keys, groups = [], []
+
+        for x, y, values in chunks:
+            x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+            cells = self.cells(x, y)
+            keep = cells >= 0
+            if values is not None:
+                values = np.asarray(values, dtype=float)
+                keep &= ~np.isnan(values)
+                values = values[keep]
+            elif reducer != "count":
+                raise ValueError(f"Reducer '{reducer}' needs a values column.")
+            cells = cells[keep]
+
+            if callable(reducer):
+                keys.append(cells)
+                groups.append(values)
+                continue
+
+            count += np.bincount(cells, minlength=nb_cells)
+            if reducer in ("sum", "mean"):
+                total += np.bincount(cells, weights=values, minlength=nb_cells)
+            elif reducer == "min":
+                np.minimum.at(low, cells, values)
+            elif reducer == "max":
+                np.maximum.at(high, cells, values)
+            elif reducer != "count":
+                raise ValueError(f"Unknown reducer '{reducer}'.")
+
+        if callable(reducer):
+            keys, groups = np.concatenate(keys), np.concatenate(groups)
+            order = np.argsort(keys, kind="stable")
+            keys, groups = keys[order], groups[order]
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=np.int64)
+            z = np.full(nb_cells, np.nan)
+            z[keys[starts]] = [reducer(group) for group in np.split(groups, starts[1:])]
+        else:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                z = {"count": count, "sum": total, "mean": total / count, "min": low, "max": high}[reducer]
+            z = np.where(count > 0, z, np.nan)
+
+        cx, cy = self.centers()
+        if self.kind == "grid":
+            self.x, self.y, self.z = cx, cy, z.reshape(self.nx, self.ny).T
+        else:
+            filled = ~np.isnan(z)
+            self.x, self.y, self.z = cx[filled], cy[filled], z[filled]
+
+    def colorbar_title(self):
+        if self.reducer == "count":
+            return "count"
+        reducer = self.reducer.__name__ if callable(self.reducer) else self.reducer
+        return f"{reducer} of {self.values_name}"
+
+    def __px__(self):
+        return go.Figure(
+            self.__go__(self.x, self.y),
+            layout=dict(title=self.title, xaxis_title=self.x_axis, yaxis_title=self.y_axis),
+        )
+
+    def __go__(self, x, y, color=None, name=None, show_name=None, row=None):
+        colorscale = self.colorscale if self.colorscale else utils.get_option("continuous_palette")
+        if self.kind == "grid":
+            return go.Heatmap(**dict(
+                dict(x=x, y=y, z=self.z, colorscale=colorscale, colorbar=dict(title=self.colorbar_title())),
+                **self.kwargs
+            ))
+
+        return go.Scatter(**dict(
+            dict(
+                x=x, y=y, mode="markers",
+                marker_symbol="hexagon", marker_size=max(3, 500 // self.nx),
+                marker_color=self.z, marker_colorscale=colorscale,
+                marker_colorbar=dict(title=self.colorbar_title()), marker_showscale=True,
+                showlegend=False,
+            ),
+            **self.kwargs
+        ))
+
+
+class ecdf(line):
+    """
+    The empirical cumulative distribution of a (possibly unbounded) set of values, estimated
+    with one mergeable quantile sketch (sketch.kll) per color group and drawn as a step line
+    of n_points points.
+
+    Attributes
+    ----------
+    + df : pandas.DataFrame|iterable|array
+        A DataFrame, an array of values or chunked input (an iterator of DataFrames or of
+        (values[, groups]) tuples, or a list of DataFrames) sketched in parallel one chunk at
+        a time. It can also be a prebuilt sketch or a dictionary mapping groups to sketches.
+    + x : str
+        The column of the values (when DataFrames are given).
+    + color : str
+        The column grouping the values (one sketch and one line per group).
+    + k : int
+        The accuracy of the sketches (their rank error is about 1.7 / k).
+    + n_points : int
+        The number of points drawn per group.
+    + workers : int
+        The number of threads sketching the chunks (default: the workers option).
+
+    Methods
+    -------
+    + fig (proprety):
+        Returns the plotly object associated with the object heriting from plot2d
+    + show:
+        Shows the figure
+    """
+    name = "ECDF"
+    line_shape = "hv"
+
+    def __init__(self, df=None, x=None, color=None, x_axis=None, y_axis=None, title=None, k=200, n_points=200, workers=None, **kwargs):
+        self.sketches = sketch.sketch_groups(df, x, color, k, workers)
+        value_name = x if isinstance(x, str) else "value"
+        color_name = color if isinstance(color, str) else "color" if any(g is not None for g in self.sketches) else None
+
+        # Only n_points points per group are drawn, whatever the number of values
+        frames = []
+        for group, group_sketch in self.sketches.items():
+            if group_sketch.n == 0:
+                continue
+            points = pandas.DataFrame(self.curve(group_sketch, n_points, value_name))
+            if color_name is not None:
+                points[color_name] = group
+            frames.append(points)
+        if not frames:
+            raise ValueError("No values to sketch.")
+
+        kwargs.setdefault("line_shape", self.line_shape)
+        x_name, y_name = frames[0].columns[:2]
+        super().__init__(pandas.concat(frames, ignore_index=True), x_name, y_name, color_name, x_axis, y_axis, title, **kwargs)
+
+    @staticmethod
+    def curve(group_sketch, n_points, value_name):
+        """
+        Returns the columns of the curve of a sketch: n_points values and their probabilities.
+        """
+        probability = np.linspace(0, 1, n_points)
+        return {value_name: group_sketch.quantile(probability), "probability": probability}
+
+
+class quantiles(ecdf):
+    """
+    The quantile function (the inverse of the ECDF) of a (possibly unbounded) set of values,
+    estimated with one mergeable quantile sketch (sketch.kll) per color group and drawn as a
+    line of n_points quantiles.
+
+    Attributes
+    ----------
+    + df : pandas.DataFrame|iterable|array
+        A DataFrame, an array of values or chunked input (an iterator of DataFrames or of
+        (values[, groups]) tuples, or a list of DataFrames) sketched in parallel one chunk at
+        a time. It can also be a prebuilt sketch or a dictionary mapping groups to sketches.
+    + x : str
+        The column of the values (when DataFrames are given).
+    + color : str
+        The column grouping the values (one sketch and one line per group).
+    + k : int
+        The accuracy of the sketches (their rank error is about 1.7 / k).
+    + n_points : int
+        The number of quantiles drawn per group.
+    + workers : int
+        The number of threads sketching the chunks (default: the workers option).
+
+    Methods
+    -------
+    + fig (proprety):
+        Returns the plotly object associated with the object heriting from plot2d
+    + show:
+        Shows the figure
+    """
+    name = "Quantiles"
+    line_shape = "linear"
+
+    @staticmethod
+    def curve(group_sketch, n_points, value_name):
+        probability = np.linspace(0, 1, n_points)
+        return {"quantile": probability, value_name: group_sketch.quantile(probability)}
+
+
 class imshow(base.draw):
+    """
+    A class grouping plotly express' imshow and plotly graph_objects' Image.
+
+    Images larger than max_pixels are downscaled (area averaging) before being displayed
+    and, inside arrangements, uint8 images are sent as a compressed PNG instead of a
+    matrix of numbers.
+
+    Attributes
+    ----------
+    + data : array
+        An image (h, w), (h, w, 3) or (h, w, 4), or a batch of frames when the animation_frame
+        or facet_col argument is given (the frames are on the axis given by that argument).
+    + max_pixels : int
+        The display budget in pixels of an image (default: the max_image_pixels option).
+
+    Methods
+    -------
+    + fig (proprety):
+        Returns the plotly object associated with the object heriting from plot2d
+    + show:
+        Shows the figure
+    + pyramid:
+        Returns the levels of a PNG pyramid of the image
+    """
     name = "Image"
 
-    def __init__(self, data=None, **kwargs):
+    def __init__(self, data=None, max_pixels=None, **kwargs):
         self.data = data
         self.kwargs = kwargs
+        self.max_pixels = max_pixels
+
+    @property
+    def is_batch(self):
+        return "animation_frame" in self.kwargs or "facet_col" in self.kwargs
+
+    def batch_axis(self, data):
+        # The axis of the frames is the one given to plotly (animation_frame or facet_col)
+        axis = self.kwargs["animation_frame"] if "animation_frame" in self.kwargs else self.kwargs["facet_col"]
+        return int(axis) % data.ndim
+
+    def image(self, factor=None):
+        """
+        Returns the image (or batch of frames) downscaled by 'factor' (by default the smallest
+        factor fitting the display budget) and the factor itself.
+        """
+        data = np.asarray(self.data)
+        # The frames of a batch are moved after the two pixel axes, moveaxis only creates views
+        axis = self.batch_axis(data) if self.is_batch else None
+        frames = np.moveaxis(data, axis, 2) if self.is_batch else data
+
+        if factor is None:
+            max_pixels = self.max_pixels if self.max_pixels else utils.get_option("max_image_pixels")
+            factor = max(1, int(np.ceil(np.sqrt(frames.shape[0] * frames.shape[1] / max_pixels))))
+        if factor == 1:
+            return data, factor
+
+        pooled = utils.block_reduce(frames, factor, "mean")
+        if data.dtype == np.uint8:
+            pooled = np.round(pooled).astype(np.uint8)
+        return (np.moveaxis(pooled, 2, axis) if self.is_batch else pooled), factor
+
+    def pyramid(self, min_size=256):
+        """
+        Returns a list of (factor, PNG data URI) levels, each level being twice smaller than the
+        previous one, down to min_size pixels. The levels can be swapped in the 'source' of the
+        Image trace depending on the zoom.
+        """
+        levels, factor = [], 1
+        while True:
+            image, _ = self.image(factor)
+            levels.append((factor, utils.png_data_uri(image)))
+            if max(image.shape[:2]) <= min_size:
+                return levels
+            factor *= 2
 
     def __px__(self):
-        return px.imshow(img=self.data, **self.kwargs)
+        image, factor = self.image()
+        kwargs = dict(self.kwargs)
+        if image.dtype == np.uint8 and "binary_string" not in kwargs and (self.is_batch or image.ndim == 3):
+            kwargs["binary_string"] = True
+
+        fig = px.imshow(img=image, **kwargs)
+        if factor > 1:
+            fig.update_traces(x0=(factor - 1) / 2, dx=factor, y0=(factor - 1) / 2, dy=factor)
+        return fig
 
     def __go__(self):
-        return go.Image(z=self.data, **self.kwargs)        
+        image, factor = self.image()
+        position = dict(x0=(factor - 1) / 2, dx=factor, y0=(factor - 1) / 2, dy=factor) if factor > 1 else {}
+
+        if image.dtype == np.uint8 and (image.ndim == 2 or image.shape[-1] in (3, 4)):
+            return go.Image(source=utils.png_data_uri(image), **position, **self.kwargs)
+        return go.Image(z=image, **position, **self.kwargs)
 
 
 # Heatmap makes more sense then imshow when using it for correlation matrices
@@ -323,6 +916,11 @@ class heatmap(base.draw):
     + data : pandas.DataFrame
         A DataFrame or array that will be displayed in the heatmap
     + colorscales: A dictionary 
+    + max_cells: int
+        Matrices with more cells are pooled by blocks (see pool) to fit in this budget
+        (default: the max_heatmap_cells option).
+    + pool: str
+        The pooling used for large matrices: "mean" or "max".
 
     Methods
     -------
@@ -339,7 +937,7 @@ class heatmap(base.draw):
     }
 
 
-    def __init__(self, data=None, range_color=None, title=None, colorscales=None, labels=None, xlabels=None, ylabels=None, **kwargs):
+    def __init__(self, data=None, range_color=None, title=None, colorscales=None, labels=None, xlabels=None, ylabels=None, max_cells=None, pool="mean", **kwargs):
         utils.itt_assertion(data, "name")
         if (xlabels or ylabels or labels) and isinstance(data, pandas.core.frame.DataFrame):
             warnings.warn("You should not specify labels when using a dataframe explicitly.")
@@ -363,19 +961,50 @@ class heatmap(base.draw):
         self.color_continuous_scale = self.colorscales["default"]
         self.colorscales = colorscales if colorscales else self.colorscales
 
+        # A single conversion and vectorized checks to infer the type of matrix
+        values = np.asarray(self.data, dtype=float)
+        low, high = np.nanmin(values), np.nanmax(values)
+
         # Infer correlation
-        if -1 <= np.array(data).min() and np.array(data).max() <= 1:
+        if -1 <= low and high <= 1:
             self.range_color = [-1,1] if range_color is None else range_color
             self.title = "Correlation Matrix" if title is None else title
             self.color_continuous_scale = self.colorscales["correlation"]
 
         # Infer confusion
-        if 0 <= np.array(data).min() and all(int(x) == x for x in np.array(data).flatten()):
+        if 0 <= low and np.all(values == np.round(values)):
             self.title = "Confusion Matrix" if title is None else title
             if "text_auto" not in self.kwargs: kwargs["text_auto"] = True
             self.color_continuous_scale = self.colorscales["confusion"]
 
         self.kwargs = kwargs
+        self.max_cells, self.pooling = max_cells, pool
+
+    def prepare(self, scans):
+        # Large matrices are pooled when the figure is built (on a copy of the object, see draw.fig)
+        if self.scans is not None:
+            return
+        super().prepare(scans)
+        values = np.asarray(self.data, dtype=float)
+        max_cells = self.max_cells if self.max_cells else utils.get_option("max_heatmap_cells")
+        if values.size > max_cells:
+            self.pool(values, int(np.ceil(np.sqrt(values.size / max_cells))), self.pooling)
+
+    def pool(self, values, factor, reducer):
+        """
+        Replaces the data by its pooling over blocks of factor x factor cells (the labels of
+        each block are the ones of its first row and column).
+        """
+        warnings.warn(f"Matrix was too large (~{values.size} cells) and was pooled ({reducer}) by blocks of {factor}x{factor}.")
+        pooled = utils.block_reduce(values, factor, reducer)
+
+        if isinstance(self.data, pandas.core.frame.DataFrame):
+            self.data = pandas.DataFrame(pooled, index=self.data.index[::factor], columns=self.data.columns[::factor])
+        else:
+            self.data = pooled
+
+        if reducer == "mean" and self.kwargs.get("text_auto") is True:
+            self.kwargs["text_auto"] = ".2f"
 
     def __px__(self):
         return px.imshow(
@@ -394,36 +1023,135 @@ class heatmap(base.draw):
 
 
 class distplot(base.draw):
-    def __init__(self, hist_data=None, columns=None, title=None, **kwargs):
+    """
+    A class behaving like plotly's figure factory create_distplot: a histogram, a density
+    curve and a rug plot for each column.
+
+    The histogram is computed with np.histogram and the kernel density estimation by
+    linear binning and FFT convolution, so only the binned values and a subsample of the
+    rug end up in the figure. Columns are processed in parallel.
+
+    Attributes
+    ----------
+    + hist_data : pandas.DataFrame|list
+        A DataFrame (every numeric column is used if columns is not given) or a list of arrays.
+    + columns : str|list
+        The columns of the DataFrame to use (or the labels of the arrays).
+    + bin_size : float|list
+        The size of the histogram bins (one per column if a list is given).
+    + curve_type : str
+        "kde" or "normal".
+    + histnorm : str
+        "probability density" or "probability".
+    + max_rug_points : int
+        The maximum number of points displayed in the rug plot of each column.
+
+    Methods
+    -------
+    + fig (proprety):
+        Returns the plotly object associated with the object heriting from plot2d
+    + show:
+        Shows the figure
+    """
+    name = "Distplot"
+    curve_points = 500
+    max_rug_points = 2000
+
+    def __init__(self, hist_data=None, columns=None, title=None, bin_size=1., curve_type="kde", histnorm="probability density", show_hist=True, show_curve=True, show_rug=True, max_rug_points=None, **kwargs):
         columns = columns if columns and isinstance(columns, list) else [columns] if columns else None
 
         if hist_data is not None and isinstance(hist_data, pandas.core.frame.DataFrame):
-            columns = columns if columns else hist_data.select_dtypes(include=np.number).columns
+            columns = columns if columns else list(hist_data.select_dtypes(include=np.number).columns)
             hist_data = [hist_data[c].values for c in columns]
 
+        if curve_type not in ("kde", "normal"):
+            raise ValueError(f"curve_type should be 'kde' or 'normal', got '{curve_type}' instead.")
+
+        for key in kwargs:
+            if key != "colors": utils.ignored_warning(kwargs[key], f"'{key}' argument", "distplot")
+
         self.kwargs = kwargs
-        self.columns = columns
+        self.columns = columns if columns else [str(i) for i in range(len(hist_data))]
         self.hist_data = hist_data
+        self.bin_size = bin_size if isinstance(bin_size, (list, tuple)) else [bin_size] * len(self.hist_data)
+        self.curve_type, self.histnorm = curve_type, histnorm
+        self.show_hist, self.show_curve, self.show_rug = show_hist, show_curve, show_rug
+        self.max_rug_points = max_rug_points if max_rug_points else self.max_rug_points
 
-        hist_title = "" if "show_hist" in kwargs and kwargs["show_hist"] is False else "Histogram" 
-        if "show_curve" in kwargs and kwargs["show_curve"] is False:
-            curve_title = ""
-        else:
-            curve_title = f"{kwargs['curve_type']} estimation" if "curve_type" in kwargs else "kernel density estimation"
+        hist_title = "Histogram" if show_hist else ""
+        curve_title = f"{curve_type} estimation" if curve_type != "kde" else "kernel density estimation"
+        curve_title = curve_title if show_curve else ""
 
         if hist_title and curve_title:
             self.title = title if title else hist_title + " and " + curve_title
         else:
             self.title = title if title else hist_title + curve_title
 
+    def estimate(self, values, bin_size):
+        """
+        Returns the histogram (bin centers and heights), the curve and the rug subsample of one column.
+        """
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        low, high = values.min(), values.max()
+
+        counts, edges = np.histogram(values, bins=np.arange(low, high + bin_size, bin_size))
+        scale = 1 / len(values) if self.histnorm == "probability" else 1 / (len(values) * bin_size)
+
+        curve_x = np.linspace(low, high, self.curve_points)
+        if self.curve_type == "kde":
+            curve_y = utils.binned_kde(values, curve_x)
+        else:
+            mean, std = values.mean(), values.std()
+            curve_y = np.exp(-0.5 * ((curve_x - mean) / std) ** 2) / (std * np.sqrt(2 * np.pi))
+        if self.histnorm == "probability":
+            curve_y = curve_y * bin_size
+
+        rug = np.random.default_rng(0).choice(len(values), self.max_rug_points, replace=False) if len(values) > self.max_rug_points else slice(None)
+        return (edges[:-1] + edges[1:]) / 2, counts * scale, curve_x, curve_y, values[rug]
+
+    def traces(self, rug_axis=None):
+        """
+        Builds the histogram, curve (and rug if rug_axis is given) traces of every column.
+        """
+        colors = self.kwargs.get("colors") or utils.color_palette(len(self.columns))
+
+        with ThreadPoolExecutor(max_workers=min(len(self.hist_data), utils.get_option("workers") or 1)) as executor:
+            estimations = utils.map_in_context(executor, self.estimate, self.hist_data, self.bin_size)
+
+        hists, curves, rugs = [], [], []
+        for i, (label, (centers, heights, curve_x, curve_y, rug)) in enumerate(zip(self.columns, estimations)):
+            color = colors[i % len(colors)]
+            show_legend = True
+
+            if self.show_hist:
+                hists.append(go.Bar(x=centers, y=heights, width=self.bin_size[i], name=label, legendgroup=label, marker_color=color, opacity=0.7))
+                show_legend = False
+            if self.show_curve:
+                curves.append(go.Scatter(x=curve_x, y=curve_y, mode="lines", name=label, legendgroup=label, showlegend=show_legend, marker_color=color))
+                show_legend = False
+            if self.show_rug and rug_axis is not None:
+                rugs.append(go.Scatter(
+                    x=rug, y=[label] * len(rug), xaxis="x", yaxis=rug_axis, mode="markers", name=label,
+                    legendgroup=label, showlegend=show_legend, marker=dict(color=color, symbol="line-ns-open")
+                ))
+
+        return hists + curves + rugs
+
     def __go__(self, *args, **kwargs):
-        raise RuntimeError("Wraplotly custom object 'distplot' cannot be arranged.")
-        
+        # In arrangements the rug plot is dropped (it needs its own y-axis)
+        return self.traces()
+
     @property
     def fig(self):
-        self.set_color_discrete_sequence(nb_of_colors=len(self.columns), color_key="colors")
-        fig = ff.create_distplot(self.hist_data, group_labels=self.columns, **self.kwargs)
-        fig.update_layout(title=self.title)
+        fig = go.Figure(self.traces("y2" if self.show_rug else None))
+        fig.update_layout(title=self.title, barmode="overlay", bargap=0, hovermode="closest", legend_traceorder="reversed")
+        if self.show_rug:
+            fig.update_layout(
+                xaxis=dict(anchor="y2", domain=[0., 1.], zeroline=False),
+                yaxis=dict(anchor="free", domain=[0.35, 1], position=0.),
+                yaxis2=dict(anchor="x", domain=[0, 0.25], dtick=1, showticklabels=False),
+            )
         return fig
 
 
@@ -447,10 +1175,7 @@ class colored_line(base.plot2d):
 
         figures, colors_in_legend = [], set()
 
-        color_palette = {
-            c: '#%02x%02x%02x' % (int(r*255), int(g*255), int(b*255))\
-            for c, (r, g, b) in zip(set(color), sns.color_palette(discrete_palette, n_colors=len(set(color))))
-        }
+        color_palette = dict(zip(set(color), utils.color_palette(len(set(color)))))
 
         for tn in range(len(x)):
             name = str(color[tn])
@@ -476,20 +1201,142 @@ class colored_line(base.plot2d):
 
 
 class pairplot(base.draw):
-    def __init__(self, df=None, color=None, title=None, width=800, height=800, **kwargs):
-        self.df = df
+    """
+    A scatter plot matrix of every numeric column of a DataFrame built on a single plotly graph_objects'
+    Splom trace per color group (every cell of the matrix shares the same column buffers and is
+    rendered with WebGL). The diagonal shows a box or histogram summary of each column.
+
+    Attributes
+    ----------
+    + df : pandas.DataFrame
+        A DataFrame containing the columns to display.
+    + color : str
+        A column of df used to color the points.
+    + columns : list
+        The columns to display (every numeric column by default).
+    + diag : str
+        "box", "histogram" or None (the summary displayed on the diagonal).
+    + max_points : int
+        If given, the rows are downsampled to about max_points (stratified on the color groups).
+
+    Methods
+    -------
+    + fig (proprety):
+        Returns the plotly object associated with the object heriting from plot2d
+    + show:
+        Shows the figure
+    """
+    name = "Pairplot"
+
+    def __init__(self, df=None, color=None, title=None, width=800, height=800, columns=None, diag="box", max_points=None, **kwargs):
+        if diag not in ("box", "histogram", None):
+            raise ValueError(f"diag should be 'box', 'histogram' or None, got '{diag}' instead.")
+
+        # Only the numeric columns (and the color column) end up in the figure
+        columns = columns if columns is not None else list(df.select_dtypes(include=np.number).columns)
+        self.columns = [c for c in columns if c != color]
+        self.df = utils.project_columns(df, *self.columns, color)
+        self.source = (utils.source_keys(df, self.df), weakref.ref(self.df))
         self.color = color
         self.title = title
         self.width = width
         self.height = height
+        self.diag = diag
+        self.max_points = max_points
         self.kwargs = kwargs
-    
+
     def __go__(self, *args, **kwargs):
         raise RuntimeError("Wraplotly custom object 'pairplot' cannot be arranged.")
 
+    def diagonal(self, values, groups, colors):
+        """
+        Builds the summaries drawn in the diagonal cells (one trace per group and column).
+
+        The statistics of every column are computed at once for each group. Boxes (and
+        histogram bars) are placed in data coordinates of the column, side by side.
+        """
+        low, high = np.nanmin(values, axis=0), np.nanmax(values, axis=0)
+        span = np.where(high > low, high - low, 1)
+        traces = []
+
+        for k, (name, rows, color) in enumerate(groups):
+            group_values = values[rows]
+
+            if self.diag == "box":
+                q0, q1, q2, q3, q4 = np.nanpercentile(group_values, [0, 25, 50, 75, 100], axis=0)
+                lower, upper = np.maximum(q0, q1 - 1.5 * (q3 - q1)), np.minimum(q4, q3 + 1.5 * (q3 - q1))
+                positions = low + (k + 0.5) / len(groups) * span
+
+            for j in range(values.shape[1]):
+                axes = dict(xaxis=f"x{j+1 if j else ''}", yaxis=f"y{j+1 if j else ''}", legendgroup=name, showlegend=False, marker_color=color)
+                if self.diag == "box":
+                    traces.append(go.Box(
+                        x=[positions[j]], q1=[q1[j]], median=[q2[j]], q3=[q3[j]], lowerfence=[lower[j]], upperfence=[upper[j]],
+                        width=0.8 * span[j] / len(groups), name=name, **axes
+                    ))
+                else:
+                    counts, edges = np.histogram(group_values[:, j][~np.isnan(group_values[:, j])], bins=20, range=(low[j], low[j] + span[j]))
+                    traces.append(go.Bar(
+                        x=(edges[:-1] + edges[1:]) / 2, y=counts / max(counts.max(), 1) * span[j], base=low[j],
+                        width=edges[1] - edges[0], opacity=0.5, name=name, **axes
+                    ))
+
+        return traces
+
     @property
     def fig(self):
-        self.set_color_discrete_sequence(nb_of_colors=len(set(self.df[self.color])), color_key="colormap")
-        fig = ff.create_scatterplotmatrix(self.df, diag='box', index=self.color, height=self.height, width=self.width, **self.kwargs)
-        fig.update_layout(title=self.title)
-        return fig
\ No newline at end of file
+        # One factorization of the color column, the groups are slices of the sorted rows
+        if self.color is not None:
+            codes, uniques = pandas.factorize(self.df[self.color])
+        else:
+            codes, uniques = np.zeros(len(self.df), dtype=np.int64), [None]
+
+        # Numeric colors with many values are drawn as one trace on a color scale (like the heatmaps of arrangements)
+        color_values = self.df[self.color] if self.color is not None else None
+        continuous = (
+            color_values is not None and len(uniques) > utils.get_option("min_objects_until_heatmap")
+            and pandas.api.types.is_numeric_dtype(color_values) and not pandas.api.types.is_bool_dtype(color_values)
+        )
+        if continuous:
+            codes, uniques = np.zeros(len(self.df), dtype=np.int64), [None]
+
+        rows = np.arange(len(codes))
+        if self.max_points is not None:
+            rows = utils.stratified_sample(codes, self.max_points)
+
+        values = self.df[self.columns].to_numpy(dtype=float)[rows]
+        codes = codes[rows]
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+
+        colors = self.kwargs.get("colors") or utils.color_palette(len(uniques))
+        kwargs = {key: value for key, value in self.kwargs.items() if key != "colors"}
+        groups = [
+            (str(group) if group is not None else self.name, order[bounds[k]:bounds[k+1]], colors[k])
+            for k, group in enumerate(uniques)
+        ]
+        scale = color_values.to_numpy(dtype=float)[rows] if continuous else None
+
+        traces = [
+            go.Splom(**dict(
+                dict(
+                    dimensions=[dict(label=c, values=values[group_rows, j]) for j, c in enumerate(self.columns)],
+                    name=name, legendgroup=name, showlegend=self.color is not None and not continuous,
+                    marker=dict(color=scale[group_rows] if continuous else color, size=3, coloraxis="coloraxis" if continuous else None),
+                    diagonal_visible=self.diag is None,
+                ),
+                **kwargs
+            ))
+            for name, group_rows, color in groups
+        ]
+
+        if self.diag is not None:
+            traces += self.diagonal(values, groups, colors)
+
+        fig = go.Figure(traces)
+        fig.update_layout(title=self.title, width=self.width, height=self.height, dragmode="select", hovermode="closest", barmode="overlay")
+        if continuous:
+            fig.update_layout(coloraxis=dict(colorscale=utils.get_option("continuous_palette"), colorbar=dict(title=dict(text=self.color))))
+        elif self.color is not None:
+            fig.update_layout(legend_title_text=self.color)
+        return fig
@@ -0,0 +1,115 @@
+"""
+Export of many wraplotly figures to a single HTML page.
+"""
+import zlib
+import json
+import base64
+import html
+from concurrent.futures import ThreadPoolExecutor
+from plotly.basedatatypes import BaseFigure
+from plotly.io.json import to_json_plotly
+from wraplotly import utils
+
+
+def export_dashboard(objects, path=None, title="wraplotly", include_plotlyjs=True, height="450px", workers=None, compression=6):
+    """
+    Writes (or returns, without path) a single HTML page drawing many figures, meant for reports
+    with hundreds of plots:
+    + plotly.js is embedded once (the page works offline) or loaded from the CDN (include_plotlyjs="cdn"),
+    + the arrays repeated across figures (like a shared datetime index) are stored once,
+    + every figure is stored as compressed JSON (deflate, decompressed by the browser),
+    + figures are only drawn when they are scrolled into view.
+
+    Usage:
+    > wp.export_dashboard([wp.line(df, "date", c) for c in columns], "report.html")
+
+    Attributes
+    ----------
+    + objects: list
+        The wraplotly objects (draw objects or arrangements) or plotly figures to export, in order.
+    + height: str
+        The CSS height of the figures without a height in their layout.
+    + workers: int
+        The number of threads building the figures (default: the workers option).
+    + compression: int
+        The zlib compression level of the payloads.
+    """
+    def payload(obj):
+        utils.raise_if_cancelled()
+        fig = obj if isinstance(obj, BaseFigure) else obj.fig
+        return json.loads(to_json_plotly(fig.to_dict()))
+
+    objects = list(objects)
+    workers = workers if workers else utils.get_option("workers") or 1
+    if workers > 1 and len(objects) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(objects))) as executor:
+            figures = utils.map_in_context(executor, payload, objects)
+    else:
+        figures = [payload(obj) for obj in objects]
+
+    # The arrays shared by the traces of different figures are stored once
+    buffers = utils.share_buffers({"data": [trace for figure in figures for trace in figure.get("data", [])]})
+
+    compress = lambda value: base64.b64encode(zlib.compress(to_json_plotly(value).encode(), compression)).decode()
+    page = dashboard_html(
+        [compress(figure) for figure in figures], compress(buffers), title, include_plotlyjs,
+        [height if "height" not in figure.get("layout", {}) else f"{figure['layout']['height']}px" for figure in figures]
+    )
+    if path is None:
+        return page
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(page)
+
+
+def dashboard_html(payloads, buffers, title, include_plotlyjs, heights):
+    """
+    Returns the page of export_dashboard from the base64 compressed payloads of the figures and
+    of their shared buffers.
+    """
+    divs = "\n".join(
+        f'<div class="wraplotly-figure" data-figure="{i}" style="height: {height};"></div>'
+        for i, height in enumerate(heights)
+    )
+    return f"""<html>
+<head><meta charset="utf-8" /><title>{html.escape(title)}</title>{utils.plotlyjs_script(include_plotlyjs)}</head>
+<body>
+{divs}
+<script>
+(function () {{
+    var payloads = {json.dumps(payloads)};
+
+    function inflate(data) {{
+        var bytes = Uint8Array.from(atob(data), function (c) {{ return c.charCodeAt(0); }});
+        var stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("deflate"));
+        return new Response(stream).text().then(JSON.parse);
+    }}
+
+    var buffers = inflate({json.dumps(buffers)});
+
+    function render(div) {{
+        return Promise.all([inflate(payloads[div.dataset.figure]), buffers]).then(function (loaded) {{
+            var figure = loaded[0], shared = loaded[1];
+            (figure.data || []).forEach(function (trace) {{
+                Object.keys(trace).forEach(function (key) {{
+                    var value = trace[key];
+                    if (value !== null && typeof value === "object" && "wpbuffer" in value) trace[key] = shared[value.wpbuffer];
+                }});
+            }});
+            return Plotly.newPlot(div, figure.data, figure.layout, {{responsive: true}});
+        }});
+    }}
+
+    // Figures are drawn once they get close to the viewport
+    var observer = new IntersectionObserver(function (entries) {{
+        entries.forEach(function (entry) {{
+            if (entry.isIntersecting) {{
+                observer.unobserve(entry.target);
+                render(entry.target);
+            }}
+        }});
+    }}, {{rootMargin: "200px"}});
+    document.querySelectorAll(".wraplotly-figure").forEach(function (div) {{ observer.observe(div); }});
+}})();
+</script>
+</body>
+</html>"""
@@ -0,0 +1,177 @@
+"""
+Latency instrumentation of the plotly-resampler widgets built by wraplotly arrangements.
+"""
+import time
+import pandas
+import numpy as np
+from plotly_resampler import FigureWidgetResampler
+from plotly_resampler.aggregation.plotly_aggregator_parser import PlotlyAggregatorParser
+from wraplotly import utils
+
+
+class latency_log:
+    """
+    A log of the server-side cost of every relayout (zoom, pan, reset) of the resampled
+    figures it is given to (make_grid(..., latency_log=log)).
+
+    Each trace registered by make_grid.add_trace is labelled with its cell and name, so the
+    timings can be grouped by cell. The round trip is measured on the server: from the
+    relayout event to the end of the update sent to the front-end.
+
+    Usage:
+    > log = latency_log(callback=print)
+    > fig = wp.grid([[0, 1]], latency_log=log) ... .fig
+    > log.traces().groupby("cell").aggregation.describe()
+
+    Attributes
+    ----------
+    + callback: callable
+        If given, called with the record of every relayout (a dictionary) once it is done.
+    + records: list
+        The records of the relayouts: the x-ranges, the time spent constructing the update
+        data, applying it to the widget and in total, the payload size, and a list of trace
+        records (cell, name, slicing and aggregation time, number of points sent, payload).
+
+    Methods
+    -------
+    + relayouts:
+        Returns a DataFrame with one row per relayout
+    + traces:
+        Returns a DataFrame with one row per updated trace per relayout
+    + clear:
+        Removes every record
+    """
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.records = []
+        self.labels = {}
+
+    def register(self, uid, **label):
+        self.labels[uid] = label
+
+    def record(self, relayout):
+        relayout["relayout"] = len(self.records)
+        self.records.append(relayout)
+        if self.callback is not None:
+            self.callback(relayout)
+
+    def relayouts(self):
+        return pandas.DataFrame([
+            {key: value for key, value in record.items() if key != "traces"} | {"nb_traces": len(record["traces"])}
+            for record in self.records
+        ])
+
+    def traces(self):
+        return pandas.DataFrame([
+            dict(relayout=record["relayout"], **trace)
+            for record in self.records for trace in record["traces"]
+        ])
+
+    def clear(self):
+        self.records = []
+
+    def __len__(self):
+        return len(self.records)
+
+    def __repr__(self):
+        return f"latency_log({len(self.records)} relayouts, {len(self.labels)} traces)"
+
+
+class instrumented_resampler(FigureWidgetResampler):
+    """
+    A FigureWidgetResampler recording the cost of its relayouts in a latency_log.
+    """
+    def __init__(self, figure=None, latency_log=None, **kwargs):
+        self._latency_log = latency_log
+        self._latency_traces = None
+        super().__init__(figure, **kwargs)
+
+    def _check_update_trace_data(self, trace, start=None, end=None):
+        if self._latency_traces is None:
+            return super()._check_update_trace_data(trace, start, end)
+
+        slicing = self.slicing_time(trace, start, end)
+        started = time.perf_counter()
+        updated = super()._check_update_trace_data(trace, start, end)
+        elapsed = time.perf_counter() - started
+
+        if updated is not None:
+            label = self._latency_log.labels.get(trace["uid"], {})
+            self._latency_traces.append(dict(
+                cell=label.get("cell"), name=label.get("name", trace.get("name")), uid=trace["uid"],
+                slicing=slicing, aggregation=max(elapsed - (slicing or 0), 0), points=utils.payload_points({"x": updated.get("x")}),
+                payload_bytes=utils.payload_bytes({key: updated.get(key) for key in ("x", "y")}),
+            ))
+        return updated
+
+    def slicing_time(self, trace, start, end):
+        """
+        Returns the time of the search of the visible range of a trace in its data (the
+        search is redone on its own, it only costs a binary search).
+        """
+        hf_trace_data = self._hf_data.get(trace["uid"])
+        if hf_trace_data is None or len(hf_trace_data["y"]) == 0:
+            return None
+        try:
+            started = time.perf_counter()
+            PlotlyAggregatorParser.get_start_end_indices(hf_trace_data, hf_trace_data["axis_type"], start, end)
+            return time.perf_counter() - started
+        except Exception:
+            return None
+
+    def _update_x_ranges(self, layout, *x_ranges, force_update=False):
+        if self._latency_log is None:
+            return super()._update_x_ranges(layout, *x_ranges, force_update=force_update)
+
+        self._latency_traces = []
+        started = time.perf_counter()
+        try:
+            super()._update_x_ranges(layout, *x_ranges, force_update=force_update)
+        finally:
+            traces, self._latency_traces = self._latency_traces, None
+
+        if traces:
+            total = time.perf_counter() - started
+            construct = sum(trace["slicing"] or 0 for trace in traces) + sum(trace["aggregation"] for trace in traces)
+            self._latency_log.record(dict(
+                x_ranges=list(x_ranges), total=total, construct=construct, update=total - construct,
+                payload_bytes=sum(trace["payload_bytes"] for trace in traces), traces=traces,
+            ))
+
+
+def replay(fig, x_ranges, repeat=1):
+    """
+    Replays a scripted sequence of zooms on a resampled figure without a front-end (the
+    widget plays its own stand-in): each element of x_ranges is one x-range per x-axis of
+    the figure (or a single (start, end) tuple for all of them), None resetting an axis to
+    its full range. Returns the duration of each relayout.
+    """
+    nb_axes = len(fig._xaxis_list)
+    durations = []
+
+    for _ in range(repeat):
+        for x_range in x_ranges:
+            per_axis = x_range is not None and all(r is None or isinstance(r, (tuple, list)) for r in x_range)
+            ranges = list(x_range) if per_axis else [x_range] * nb_axes
+            ranges = [full_range(fig, i) if r is None else [as_relayout_value(v) for v in r] for i, r in enumerate(ranges)]
+            started = time.perf_counter()
+            fig._update_x_ranges(fig.layout, *ranges, force_update=True)
+            durations.append(time.perf_counter() - started)
+    return np.array(durations)
+
+
+def full_range(fig, axis_index):
+    """
+    Returns the range covering the data of every trace drawn on an x-axis of a resampled figure.
+    """
+    axis = "x" + (str(axis_index + 1) if axis_index else "")
+    bounds = [
+        (hf["x"][0], hf["x"][-1]) for trace in fig.data for hf in [fig._hf_data.get(trace.uid)]
+        if hf is not None and len(hf["x"]) and (trace.xaxis or "x") == axis
+    ]
+    return [as_relayout_value(min(b[0] for b in bounds)), as_relayout_value(max(b[1] for b in bounds))] if bounds else None
+
+
+def as_relayout_value(value):
+    # The front-end sends dates as strings
+    return str(pandas.Timestamp(value)) if isinstance(value, (pandas.Timestamp, np.datetime64)) else value
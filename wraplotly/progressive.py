@@ -0,0 +1,150 @@
+"""
+Progressive drawing of wraplotly objects: a sampled draft first, refined in the background.
+"""
+import asyncio
+import warnings
+import threading
+import contextvars
+import plotly.graph_objects as go
+from wraplotly import utils
+
+
+# The sizes of the samples drawn before the whole data
+SAMPLE_SIZES = (10_000, 1_000_000)
+
+
+class preview:
+    """
+    A figure drawn progressively. A FigureWidget is drawn right away from a small sample of
+    the data (stratified on the color groups, so rare groups are visible in the draft), then a
+    background thread draws larger samples and finally the whole data (downsampled or
+    aggregated like the figure of the object), updating the widget in place after each stage.
+
+    The samples are drawn without plotly-resampler. Resampled figures end as the downsampled
+    view of the whole data sorted by x (use .fig to zoom with plotly-resampler).
+
+    Usage:
+    > p = wp.scatter(df, "x", "y", color="label").preview()
+    > p  # displays the widget, refined while the next cells run
+    > p.wait()
+
+    Attributes
+    ----------
+    + obj: draw|make_grid
+        The object (or arrangement) drawn.
+    + sizes: list
+        The sizes of the samples drawn before the whole data (default: SAMPLE_SIZES), the ones
+        larger than the data are skipped.
+    + callback: callable
+        If given, called with the preview after each refinement.
+    + widget: plotly.graph_objects.FigureWidget
+        The figure, updated in place.
+    + stage: int
+        The number of stages drawn (the last one draws the whole data).
+    + error: Exception
+        The exception raised by a refinement, if any (it is also reported with a warning).
+
+    Methods
+    -------
+    + wait(timeout):
+        Waits for the last stage, returns True if it was drawn
+    + cancel:
+        Stops the refinements
+    """
+    def __init__(self, obj, sizes=None, callback=None):
+        self.obj = obj
+        self.callback = callback
+        self.scans = utils.column_scans()
+        self.error = None
+        self.done, self.cancelled = threading.Event(), threading.Event()
+
+        points = nb_points(obj)
+        self.sizes = [size for size in sorted(sizes if sizes is not None else SAMPLE_SIZES) if size < points]
+        self.stages = self.sizes + [None]
+
+        self.widget = go.FigureWidget(self.build(self.stages[0]))
+        self.stage = 1
+
+        if len(self.stages) == 1:
+            self.done.set()
+            return
+
+        # The refinements stop between the steps of a build once cancelled (see utils.raise_if_cancelled)
+        context = contextvars.copy_context()
+        context.run(utils.cancel_event.set, self.cancelled)
+        self.thread = threading.Thread(target=context.run, args=(self.refine,), daemon=True)
+        self.thread.start()
+
+    @property
+    def fig(self):
+        return self.widget
+
+    def build(self, size):
+        """
+        Returns the figure of a sample of size points of the object (of the whole object for None).
+        """
+        if size is None:
+            return self.obj.sort_x().fig
+        token = utils.resampler_enabled.set(False)
+        try:
+            return self.obj.sample(size, self.scans).fig
+        finally:
+            utils.resampler_enabled.reset(token)
+
+    def refine(self):
+        try:
+            for size in self.stages[1:]:
+                fig = self.build(size)
+                utils.raise_if_cancelled()
+                self.update(fig)
+                self.stage += 1
+                if self.callback is not None:
+                    self.callback(self)
+        except asyncio.CancelledError:
+            pass
+        except Exception as error:
+            self.error = error
+            warnings.warn(f"The preview could not be refined past stage {self.stage}/{len(self.stages)}: {error!r}")
+        finally:
+            self.done.set()
+
+    def update(self, fig):
+        """
+        Replaces the traces and the layout of the widget by the ones of fig.
+        """
+        traces = [trace.to_plotly_json() for trace in fig.data]
+        for trace in traces:
+            trace.pop("uid", None)
+
+        if [trace.type for trace in self.widget.data] == [trace["type"] for trace in traces]:
+            with self.widget.batch_update():
+                for trace, new_trace in zip(self.widget.data, traces):
+                    # The properties the new trace does not set (like x replaced by x0/dx) are removed
+                    removed = {key: None for key in trace.to_plotly_json() if key not in new_trace and key not in ("type", "uid")}
+                    trace.update({**removed, **new_trace}, overwrite=True)
+                self.widget.layout.update(fig.layout.to_plotly_json(), overwrite=True)
+        else:
+            self.widget.data = ()
+            self.widget.add_traces(traces)
+            self.widget.layout.update(fig.layout.to_plotly_json(), overwrite=True)
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout) and self.error is None and not self.cancelled.is_set()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _repr_mimebundle_(self, include=None, exclude=None):
+        return self.widget._repr_mimebundle_(include, exclude)
+
+    def __repr__(self):
+        return f"preview({self.obj!r}, stage={self.stage}/{len(self.stages)})"
+
+
+def nb_points(obj):
+    """
+    Returns the number of points of the largest object of an arrangement (or of an object).
+    """
+    if hasattr(obj, "objects"):
+        return max((o.nb_points for objects in obj.objects for o, _ in objects), default=0)
+    return obj.nb_points
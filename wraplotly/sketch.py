@@ -0,0 +1,182 @@
+"""
+Mergeable streaming quantile sketches used to draw distributions of unbounded data.
+"""
+import pandas
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from wraplotly import utils
+
+
+class kll:
+    """
+    A KLL quantile sketch: a stack of compactors where the items of level h stand for 2^h
+    values. A level over its capacity is sorted and every other item (from a random offset)
+    is promoted to the next level. The rank error is about 1.7 / k of the number of values,
+    whatever that number is, and two sketches are merged level by level.
+
+    Usage:
+    > sketch = kll()
+    > for chunk in chunks: sketch.update(chunk)
+    > sketch.quantile([0.5, 0.99])
+
+    Attributes
+    ----------
+    + k: int
+        The capacity of the top level (the accuracy of the sketch).
+    + n: int
+        The number of values seen.
+    + min / max: float
+        The exact extremes of the values seen.
+
+    Methods
+    -------
+    + update(values):
+        Adds an array of values to the sketch
+    + merge(other):
+        Adds the values summarized by another sketch
+    + quantile(q):
+        Returns the estimated quantiles of probabilities q
+    + cdf(values):
+        Returns the estimated fraction of values lower or equal to values
+    """
+    c = 2 / 3
+
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.n = 0
+        self.min, self.max = np.inf, -np.inf
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def capacity(self, level):
+        return max(2, int(np.ceil(self.k * self.c ** (len(self.levels) - level - 1))))
+
+    def compress(self):
+        # Like in the KLL paper, only the lowest full level is compacted, and only while the
+        # sketch holds more items than the sum of the capacities (about 3k items)
+        while len(self) > sum(self.capacity(level) for level in range(len(self.levels))):
+            level = next(level for level, items in enumerate(self.levels) if len(items) >= self.capacity(level))
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(self.levels[level])
+            # An odd item stays at its level, the others are halved
+            kept, items = items[:len(items) % 2], items[len(items) % 2:]
+            self.levels[level] = kept
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], items[self.rng.integers(2)::2]])
+        return self
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+
+        self.n += len(values)
+        self.min, self.max = min(self.min, values.min()), max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        return self.compress()
+
+    def merge(self, other):
+        if other.n == 0:
+            return self
+
+        self.n += other.n
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        self.levels += [np.empty(0)] * (len(other.levels) - len(self.levels))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        return self.compress()
+
+    def weighted_items(self):
+        """
+        Returns the sorted items of the sketch and their cumulative weights.
+        """
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level_items), 2 ** level) for level, level_items in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], np.cumsum(weights[order])
+
+    def quantile(self, q):
+        if self.n == 0:
+            raise ValueError("Cannot compute the quantiles of an empty sketch.")
+
+        q = np.asarray(q, dtype=float)
+        items, cumulative = self.weighted_items()
+        ranks = np.searchsorted(cumulative, q * cumulative[-1], side="left")
+        estimates = items[np.minimum(ranks, len(items) - 1)]
+        # The extremes are exact
+        return np.where(q <= 0, self.min, np.where(q >= 1, self.max, estimates))
+
+    def cdf(self, values):
+        items, cumulative = self.weighted_items()
+        ranks = np.searchsorted(items, np.asarray(values, dtype=float), side="right")
+        return np.where(ranks > 0, cumulative[np.maximum(ranks - 1, 0)], 0) / cumulative[-1]
+
+    def __len__(self):
+        return sum(len(items) for items in self.levels)
+
+    def __repr__(self):
+        return f"kll(k={self.k}, n={self.n}, items={len(self)})"
+
+
+def sketch_chunk(values, groups=None, k=200):
+    """
+    Returns a dictionary mapping each group of a chunk (None without groups) to the sketch of
+    its values.
+    """
+    values = np.asarray(values, dtype=float)
+    if groups is None:
+        return {None: kll(k).update(values)}
+
+    codes, uniques = pandas.factorize(np.asarray(groups))
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    return {group: kll(k).update(values[order[bounds[i]:bounds[i + 1]]]) for i, group in enumerate(uniques)}
+
+
+def merge_sketches(sketches, other):
+    """
+    Merges the dictionary of sketches other in sketches (in place) and returns sketches.
+    """
+    for group, sketch in other.items():
+        if group in sketches:
+            sketches[group].merge(sketch)
+        else:
+            sketches[group] = sketch
+    return sketches
+
+
+def sketch_groups(data, x=None, color=None, k=200, workers=None):
+    """
+    Returns a dictionary mapping each group (None without color) to the sketch of its values.
+
+    data is a DataFrame (with the x and color columns), an array of values, chunked input
+    (see utils.is_chunked, chunks being DataFrames or (values[, groups]) tuples), a sketch or
+    a dictionary of prebuilt sketches. Chunks are sketched in parallel by a pool of workers
+    (a few chunks at a time, so iterators are never loaded at once) and the sketches merged.
+    """
+    if isinstance(data, kll):
+        return {None: data}
+    if isinstance(data, dict) and all(isinstance(sketch, kll) for sketch in data.values()):
+        return dict(data)
+
+    if utils.is_chunked(data):
+        chunks = (utils.chunk_columns(chunk, x, color) for chunk in data)
+    elif isinstance(data, pandas.core.frame.DataFrame):
+        values = data[x] if x is not None else data.iloc[:, 0]
+        chunks = utils.chunk_slices(values, data[color] if color is not None else None)
+    else:
+        chunks = utils.chunk_slices(data, None)
+
+    workers = workers if workers else utils.get_option("workers") or 1
+    sketch = lambda values, groups: sketch_chunk(values, groups, k)
+    sketches = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        chunks = iter(chunks)
+        while True:
+            window = [chunk for _, chunk in zip(range(workers), chunks)]
+            if not window:
+                return sketches
+            for result in utils.map_in_context(executor, sketch, *zip(*window)):
+                merge_sketches(sketches, result)
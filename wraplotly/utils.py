@@ -1,9 +1,147 @@
+import os
+import sys
+import zlib
+import json
+import asyncio
+import threading
+import base64
+import struct
 import pandas
 import warnings
+import contextvars
 import numpy as np
+import seaborn as sns
+import plotly.io
+import plotly.offline
+import collections.abc
+from plotly.io.json import to_json_plotly
+from plotly.basewidget import BaseFigureWidget
 
 
 MIN_POINTS_BEFORE_RESAMPLING = 75000
+MAX_HEATMAP_CELLS = 250000
+MAX_IMAGE_PIXELS = 2000000
+# Number of rows read at once when arrays (possibly memory-mapped) are aggregated by chunks
+CHUNK_SIZE = 1 << 20
+# The executor used by the async API (None: the default executor of the event loop)
+EXECUTOR = None
+# The number of threads used to build the cells of an arrangement, to sketch chunks or to
+# build the figures of a dashboard. Their pools can be nested (a dashboard of arrangements)
+# and the speedup depends on the share of the work releasing the GIL: measure it with
+# benchmarks/workers.py before raising it.
+WORKERS = 1
+
+# Options that can be set for a context with 'config'. Outside of a config
+# block the value of the module global is used.
+options_defaults = {
+    "discrete_palette": ("wraplotly", "discrete_palette"),
+    "continuous_palette": ("wraplotly", "continuous_palette"),
+    "min_points_before_resampling": ("wraplotly.utils", "MIN_POINTS_BEFORE_RESAMPLING"),
+    "min_objects_until_heatmap": ("wraplotly.base", "MIN_OBJECTS_UNTIL_HEATMAP"),
+    "max_heatmap_cells": ("wraplotly.utils", "MAX_HEATMAP_CELLS"),
+    "max_image_pixels": ("wraplotly.utils", "MAX_IMAGE_PIXELS"),
+    "executor": ("wraplotly.utils", "EXECUTOR"),
+    "workers": ("wraplotly.utils", "WORKERS"),
+}
+
+context_options = contextvars.ContextVar("wraplotly_options", default={})
+
+
+def get_option(name):
+    """
+    Returns the value of an option in the current context (see config).
+    """
+    options = context_options.get()
+    if name in options:
+        return options[name]
+    module, attribute = options_defaults[name]
+    return getattr(sys.modules[module], attribute)
+
+
+class config:
+    """
+    Sets wraplotly options for the current context only: the current thread or asyncio task
+    (threads started inside the block do not inherit them, use copy_context for that).
+
+    Usage:
+    > with wp.config(discrete_palette="deep", min_points_before_resampling=1_000_000):
+    >     fig = grid.fig
+
+    Attributes
+    ----------
+    + options:
+        Any of discrete_palette, continuous_palette, min_points_before_resampling,
+        min_objects_until_heatmap, max_heatmap_cells, max_image_pixels, executor and workers.
+    """
+    def __init__(self, **options):
+        for name in options:
+            if name not in options_defaults:
+                raise ValueError(f"Unknown option '{name}' (expected one of {list(options_defaults)}).")
+        self.options = options
+
+    def __enter__(self):
+        self.token = context_options.set({**context_options.get(), **self.options})
+        return self
+
+    def __exit__(self, *exc):
+        context_options.reset(self.token)
+
+
+def map_in_context(executor, function, *iterables):
+    """
+    Like executor.map, but every call runs in a copy of the current context so that the
+    options set with config also apply in the workers.
+    """
+    futures = [executor.submit(contextvars.copy_context().run, function, *args) for args in zip(*iterables)]
+    return [future.result() for future in futures]
+
+
+# Cleared (in the context of the drafts of progressive previews) to draw without plotly-resampler
+resampler_enabled = contextvars.ContextVar("wraplotly_resampler_enabled", default=True)
+
+# Set (in the context of a build started by run_async) when the build should stop
+cancel_event = contextvars.ContextVar("wraplotly_cancel_event", default=None)
+
+
+def raise_if_cancelled():
+    """
+    Stops a figure build started by run_async that was cancelled or timed out.
+    Called between the expensive steps of a build.
+    """
+    event = cancel_event.get()
+    if event is not None and event.is_set():
+        raise asyncio.CancelledError("The figure build was cancelled.")
+
+
+async def run_async(function, executor=None, timeout=None):
+    """
+    Runs function in a thread executor (by default the executor option) in a copy of the
+    current context, without blocking the event loop.
+
+    When the awaiting task is cancelled or the timeout expires, the build is asked to stop
+    (see raise_if_cancelled) and the exception is raised to the caller.
+    """
+    loop = asyncio.get_running_loop()
+    event = threading.Event()
+    context = contextvars.copy_context()
+    context.run(cancel_event.set, event)
+
+    future = loop.run_in_executor(executor if executor else get_option("executor"), context.run, function)
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except (asyncio.CancelledError, asyncio.TimeoutError):
+        event.set()
+        raise
+
+
+def color_palette(nb_of_colors):
+    """
+    Returns nb_of_colors colors ('#rrggbb') of the discrete palette.
+    """
+    return [
+        '#%02x%02x%02x' % (int(r*255), int(g*255), int(b*255))\
+        for r, g, b in sns.color_palette(get_option("discrete_palette"), n_colors=nb_of_colors)
+    ]
 
 
 def str_assertion(obj, name, header=""):
@@ -23,22 +161,1032 @@ def ignored_warning(obj, name, header=""):
         warnings.warn(f"{header}: {name} is ignored.")
 
 
-def needs_resample(*args):
-    nb_points = sum(len(arg) for arg in args if arg is not None and not isinstance(arg, str))
-    return nb_points > MIN_POINTS_BEFORE_RESAMPLING
+def project_columns(df, *cols):
+    """
+    Returns a copy of df restricted to the given columns or lists of columns (None entries and
+    names that are not columns, like the index name, are ignored).
 
+    The copy is explicit: selecting columns can return a frame sharing the blocks of df,
+    which would keep every column of the original dataframe alive.
+    """
+    cols = [c for col in cols if col is not None for c in (col if isinstance(col, list) else [col])]
+    cols = [col for col in dict.fromkeys(cols) if col in df.columns]
+    return df[cols].copy()
 
-def count_nans_in_df_and_alert(df, *cols):
-    for col in cols:
-        if col is None:
+
+def hex_to_rgba(color, alpha):
+    """
+    Converts a '#rrggbb' color (as generated from the seaborn palettes) to an rgba string.
+    """
+    if color is None:
+        return None
+    r, g, b = (int(color[i:i+2], 16) for i in (1, 3, 5))
+    return f"rgba({r}, {g}, {b}, {alpha})"
+
+
+def reduce_by_key(keys, values, reducers):
+    """
+    Reduces the values sharing the same key in a single sorted pass.
+
+    Returns the sorted unique keys and a dictionary mapping each reducer
+    ("mean", "sum", "count", "min" or "max") to the array of reduced values.
+    """
+    keys, values = np.asarray(keys), np.asarray(values)
+    order = np.argsort(keys, kind="stable")
+    keys, values = keys[order], values[order]
+
+    if len(keys) == 0:
+        return keys, {reducer: values for reducer in reducers}
+
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    counts = np.diff(np.r_[starts, len(keys)])
+
+    reduced = {}
+    for reducer in reducers:
+        if reducer == "count":
+            reduced[reducer] = counts
+        elif reducer == "sum":
+            reduced[reducer] = np.add.reduceat(values, starts)
+        elif reducer == "mean":
+            reduced[reducer] = np.add.reduceat(values, starts) / counts
+        elif reducer == "min":
+            reduced[reducer] = np.minimum.reduceat(values, starts)
+        elif reducer == "max":
+            reduced[reducer] = np.maximum.reduceat(values, starts)
+        else:
+            raise ValueError(f"Unknown aggregation '{reducer}' (expected one of 'mean', 'sum', 'count', 'min', 'max').")
+
+    return keys[starts], reduced
+
+
+def reduce_chunks_by_key(chunks, reducers):
+    """
+    Same as reduce_by_key for (keys, values) pairs given one chunk at a time: each chunk is
+    reduced to mergeable partial counts, sums, minimums and maximums, which are then merged.
+    """
+    for reducer in reducers:
+        if reducer not in ("mean", "sum", "count", "min", "max"):
+            raise ValueError(f"Unknown aggregation '{reducer}' (expected one of 'mean', 'sum', 'count', 'min', 'max').")
+
+    partial = ["count"] + [r for r in ("sum", "min", "max") if r in reducers or (r == "sum" and "mean" in reducers)]
+    merge = {"count": "sum", "sum": "sum", "min": "min", "max": "max"}
+
+    keys, parts = [], {reducer: [] for reducer in partial}
+    for chunk_keys, chunk_values in chunks:
+        chunk_keys, reduced = reduce_by_key(chunk_keys, chunk_values, partial)
+        keys.append(chunk_keys)
+        for reducer in partial:
+            parts[reducer].append(reduced[reducer])
+
+    keys = np.concatenate(keys) if keys else np.array([], dtype=np.int64)
+    merged = {}
+    for reducer in partial:
+        values = np.concatenate(parts[reducer]) if parts[reducer] else np.array([])
+        unique_keys, reduced = reduce_by_key(keys, values, [merge[reducer]])
+        merged[reducer] = reduced[merge[reducer]]
+
+    if "mean" in reducers:
+        merged["mean"] = merged["sum"] / merged["count"]
+    return unique_keys, {reducer: merged[reducer] for reducer in reducers}
+
+
+def is_chunked(obj):
+    """
+    Returns true if obj is chunked input: an iterator (or generator) of chunks, a
+    list/tuple of dataframes or a Parquet file read by batches (parquet_chunks).
+    """
+    if isinstance(obj, (str, np.ndarray, pandas.core.frame.DataFrame, pandas.core.series.Series)):
+        return False
+    if isinstance(obj, (collections.abc.Iterator, parquet_chunks)):
+        return True
+    return isinstance(obj, (list, tuple)) and len(obj) > 0 and all(isinstance(c, pandas.core.frame.DataFrame) for c in obj)
+
+
+def chunk_columns(chunk, *cols):
+    """
+    Returns the arrays of a chunk: either the given columns of a dataframe chunk or the
+    elements of a tuple chunk (like (x, y) or (x, y, values)).
+    """
+    if isinstance(chunk, pandas.core.frame.DataFrame):
+        return [np.asarray(chunk[col]) if col is not None else None for col in cols]
+    chunk = list(chunk) + [None] * (len(cols) - len(chunk))
+    return [np.asarray(c) if c is not None else None for c in chunk[:len(cols)]]
+
+
+def is_path(obj, suffixes=(".npy", ".parquet", ".pq")):
+    """
+    Returns true if obj is the path of a file wraplotly can read (a .npy or a Parquet file).
+    """
+    return isinstance(obj, (str, os.PathLike)) and os.fspath(obj).lower().endswith(suffixes)
+
+
+def load_path(path, columns=None):
+    """
+    Opens a .npy file as a read-only memory map, or reads the given columns (all of them if
+    columns is None) of a Parquet file with a memory-mapped reader (pyarrow is needed).
+    """
+    path = os.fspath(path)
+    if is_path(path, (".npy",)):
+        return np.load(path, mmap_mode="r")
+    if is_path(path, (".parquet", ".pq")):
+        columns = [col for col in dict.fromkeys(columns or []) if isinstance(col, str)] or None
+        return pandas.read_parquet(path, columns=columns, memory_map=True)
+    raise ValueError(f"Unsupported file '{path}' (expected a .npy or a .parquet file).")
+
+
+class parquet_chunks:
+    """
+    Chunked input reading a Parquet file by batches of rows: only the given columns of
+    one batch are in memory at a time. It can be iterated over more than once.
+    """
+    def __init__(self, path, columns=None, batch_size=None):
+        self.path = os.fspath(path)
+        self.columns = [col for col in dict.fromkeys(columns or []) if isinstance(col, str)] or None
+        self.batch_size = batch_size if batch_size else CHUNK_SIZE
+
+    def __iter__(self):
+        import pyarrow.parquet
+
+        with pyarrow.parquet.ParquetFile(self.path, memory_map=True) as file:
+            for batch in file.iter_batches(batch_size=self.batch_size, columns=self.columns):
+                yield batch.to_pandas()
+
+
+def chunk_slices(*arrays, chunk_size=None):
+    """
+    Returns consecutive slices of the arrays, CHUNK_SIZE rows at a time. Slices are views,
+    so a memory-mapped array is only read from disk when one of its slices is used.
+    """
+    size = chunk_size if chunk_size else CHUNK_SIZE
+    n = max((len(a) for a in arrays if a is not None), default=0)
+
+    def part(a, i):
+        if a is None:
+            return None
+        return a.iloc[i:i + size] if isinstance(a, (pandas.core.series.Series, pandas.core.frame.DataFrame)) else a[i:i + size]
+
+    return [[part(a, i) for a in arrays] for i in range(0, max(n, 1), size)]
+
+
+def binned_kde(values, grid):
+    """
+    Gaussian kernel density estimation of values evaluated on an evenly spaced grid.
+
+    The values are linearly binned on the grid and the bin weights are convolved with
+    the gaussian kernel using FFTs, which costs O(n + m log m) instead of O(n * m).
+    The bandwidth follows Scott's rule (like scipy's gaussian_kde).
+    """
+    n, m = len(values), len(grid)
+    bandwidth = values.std(ddof=1) * n ** (-1 / 5) if n > 1 else 0
+    delta = grid[1] - grid[0] if m > 1 else 0
+
+    if bandwidth <= 0 or delta <= 0:
+        return np.zeros(m)
+
+    position = (values - grid[0]) / delta
+    idx = np.clip(np.floor(position).astype(np.int64), 0, m - 2)
+    frac = position - idx
+    weights = np.bincount(idx, 1 - frac, minlength=m) + np.bincount(idx + 1, frac, minlength=m)
+
+    half_width = min(int(np.ceil(4 * bandwidth / delta)), m - 1)
+    offsets = np.arange(-half_width, half_width + 1) * delta
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi) * n)
+
+    size = 1 << int(np.ceil(np.log2(m + len(kernel) - 1)))
+    density = np.fft.irfft(np.fft.rfft(weights, size) * np.fft.rfft(kernel, size), size)
+    return np.maximum(density[half_width:half_width + m], 0)
+
+
+def stratified_sample(codes, size, min_per_group=100, seed=0):
+    """
+    Returns the sorted indices of a random sample of about 'size' rows, stratified on the
+    group codes: each group keeps its share of the sample but at least min_per_group rows
+    (or all of them) so that rare groups stay visible.
+
+    Every row is kept with the probability of its group, one chunk of rows at a time: the
+    sample costs a single pass over the codes (no sort), even for hundreds of millions of rows.
+    """
+    codes = np.asarray(codes)
+    if len(codes) <= size:
+        return np.arange(len(codes))
+
+    # The missing values (code -1) are a group of their own
+    codes = codes + 1 if codes.min() < 0 else codes
+    sizes = np.bincount(codes)
+    quotas = np.minimum(sizes, np.maximum(np.ceil(sizes * size / len(codes)), min_per_group))
+    probability = np.divide(quotas, sizes, out=np.ones(len(sizes)), where=sizes > 0)
+
+    rng = np.random.default_rng(seed)
+    return np.concatenate([
+        start + np.flatnonzero(rng.random(len(chunk)) < probability[chunk])
+        for start in range(0, len(codes), CHUNK_SIZE) for chunk in [codes[start:start + CHUNK_SIZE]]
+    ])
+
+
+def block_reduce(values, factor, reducer="mean"):
+    """
+    Pools the two first axes of values by blocks of factor x factor ("mean" or "max"),
+    the incomplete blocks on the edges are padded with NaNs (ignored by the reduction).
+    """
+    values = np.asarray(values, dtype=float)
+    rows, cols = values.shape[:2]
+    pad_rows, pad_cols = -rows % factor, -cols % factor
+    padding = [(0, pad_rows), (0, pad_cols)] + [(0, 0)] * (values.ndim - 2)
+    padded = np.pad(values, padding, constant_values=np.nan) if pad_rows or pad_cols else values
+    blocks = padded.reshape((rows + pad_rows) // factor, factor, (cols + pad_cols) // factor, factor, *values.shape[2:])
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        if reducer == "mean":
+            return np.nanmean(blocks, axis=(1, 3))
+        if reducer == "max":
+            return np.nanmax(blocks, axis=(1, 3))
+    raise ValueError(f"Unknown pooling '{reducer}' (expected 'mean' or 'max').")
+
+
+TRENDLINES = ("ols", "rolling", "lowess", "ewm")
+
+
+def spread_indices(bounds, nb_points):
+    """
+    Returns the indices of at most nb_points evenly spaced rows of every group of sorted data
+    (the rows of group g being bounds[g]:bounds[g+1]), and the group of each index.
+    """
+    sizes = np.diff(bounds)
+    counts = np.minimum(sizes, nb_points)
+    groups = np.repeat(np.arange(len(sizes)), counts)
+    position = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    step = (sizes[groups] - 1) / np.maximum(counts[groups] - 1, 1)
+    return bounds[groups] + np.round(position * step).astype(np.int64), groups
+
+
+def trendlines(x, y, codes=None, method="ols", options=None):
+    """
+    Returns the trendline of every group of points as a dictionary code -> (x, y), codes being
+    the group of each point (from pandas.factorize, None for a single group). The points are
+    sorted by group and x once, and every group is fitted in the same vectorized pass:
+    + "ols": least squares line (drawn with its two ends),
+    + "rolling": mean over a window of points (options: window, default 10),
+    + "ewm": exponentially weighted mean (options: alpha, span, halflife or com, default span=10),
+    + "lowess": locally weighted linear regression on an evenly spaced subset of the points
+      (options: frac, the fraction of the subset used by each local fit, default 2/3, and
+      sample, the size of the subset of each group, default 500).
+    The curves of rolling, ewm and lowess have at most options["points"] points (default 200).
+    """
+    if method not in TRENDLINES:
+        raise ValueError(f"Unknown trendline '{method}' (expected one of {list(TRENDLINES)}).")
+    options = dict(options or {})
+    nb_points = options.pop("points", 200)
+
+    is_datetime = pandas.api.types.is_datetime64_any_dtype(x)
+    if is_datetime:
+        x = pandas.DatetimeIndex(x).as_unit("ns")
+        tz, xs = x.tz, np.where(x.isna(), np.nan, x.asi8.astype(float))
+    else:
+        xs = np.asarray(x, dtype=float)
+    ys = np.asarray(y, dtype=float)
+    codes = np.zeros(len(ys), dtype=np.int64) if codes is None else np.asarray(codes, dtype=np.int64)
+
+    keep = ~np.isnan(xs) & ~np.isnan(ys) & (codes >= 0)
+    xs, ys, codes = xs[keep], ys[keep], codes[keep]
+    order = np.lexsort((xs, codes))
+    xs, ys, codes = xs[order], ys[order], codes[order]
+    nb_groups = int(codes.max()) + 1 if len(codes) else 0
+    bounds = np.searchsorted(codes, np.arange(nb_groups + 1))
+
+    if method == "ols":
+        line_x, line_y, line_codes = ols_lines(xs, ys, codes, bounds)
+    elif method == "lowess":
+        line_x, line_y, line_codes = lowess_lines(xs, ys, bounds, nb_points, options.get("frac", 2 / 3), options.get("sample", 500))
+    else:
+        if method == "rolling":
+            window = options.get("window", 10)
+            sums = np.r_[0, np.cumsum(ys)]
+            end = np.arange(1, len(ys) + 1)
+            start = np.maximum(end - window, bounds[codes])
+            smooth = np.where(end - start == window, (sums[end] - sums[start]) / window, np.nan)
+        else:
+            smooth = pandas.Series(ys).groupby(codes).ewm(**(options or {"span": 10})).mean().to_numpy()
+        rows, line_codes = spread_indices(bounds, nb_points)
+        line_x, line_y = xs[rows], smooth[rows]
+
+    if is_datetime:
+        line_x = pandas.to_datetime(line_x.astype(np.int64), unit="ns", utc=tz is not None)
+        line_x = line_x.tz_convert(tz) if tz is not None else line_x
+
+    # Groups of a single point have no trend
+    sizes, line_bounds = np.diff(bounds), np.searchsorted(line_codes, np.arange(nb_groups + 1))
+    return {
+        code: (line_x[line_bounds[code]:line_bounds[code + 1]], line_y[line_bounds[code]:line_bounds[code + 1]])
+        for code in range(nb_groups) if sizes[code] >= 2
+    }
+
+
+def ols_lines(xs, ys, codes, bounds):
+    """
+    Least squares lines of the groups of points sorted by group and x (see trendlines).
+    """
+    sizes = np.diff(bounds)
+    nb_groups = len(sizes)
+    mean_x = np.bincount(codes, xs, nb_groups) / np.maximum(sizes, 1)
+    mean_y = np.bincount(codes, ys, nb_groups) / np.maximum(sizes, 1)
+    dx = xs - mean_x[codes]
+    sxx, sxy = np.bincount(codes, dx * dx, nb_groups), np.bincount(codes, dx * ys, nb_groups)
+    slope = np.divide(sxy, sxx, out=np.zeros(nb_groups), where=sxx > 0)
+
+    groups = np.flatnonzero(sizes >= 2)
+    line_codes = np.repeat(groups, 2)
+    line_x = np.stack([xs[bounds[groups]], xs[bounds[groups + 1] - 1]], axis=1).ravel()
+    return line_x, mean_y[line_codes] + slope[line_codes] * (line_x - mean_x[line_codes]), line_codes
+
+
+def lowess_lines(xs, ys, bounds, nb_points, frac, sample):
+    """
+    LOWESS curves of the groups of points sorted by group and x (see trendlines), evaluated on
+    nb_points evenly spaced x. The subsets of the groups are padded into a (groups, sample)
+    matrix and the local fits of blocks of groups are computed at once.
+    """
+    sizes = np.diff(bounds)
+    nb_groups = len(sizes)
+    groups = np.flatnonzero(sizes >= 2)
+    rows, row_groups = spread_indices(bounds, sample)
+    counts = np.minimum(sizes, sample)
+    width = max(int(counts.max()), 1) if nb_groups else 1
+
+    # x is rescaled to [0, 1] in each group
+    low = xs[np.minimum(bounds[:-1], len(xs) - 1)] if len(xs) else np.zeros(nb_groups)
+    high = xs[np.maximum(bounds[1:] - 1, 0)] if len(xs) else np.zeros(nb_groups)
+    scale = np.where(high > low, high - low, 1)
+    position = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    sample_x, sample_y = np.full((nb_groups, width), np.inf), np.zeros((nb_groups, width))
+    sample_x[row_groups, position] = (xs[rows] - low[row_groups]) / scale[row_groups]
+    sample_y[row_groups, position] = ys[rows]
+
+    t = np.linspace(0, 1, nb_points)
+    neighbours = np.clip(np.ceil(frac * counts).astype(np.int64), 2, np.maximum(counts, 2))
+    fitted = np.empty((len(groups), nb_points))
+    block = max(1, (1 << 20) // (nb_points * width))
+
+    for i in range(0, len(groups), block):
+        g = groups[i:i + block]
+        distances = np.abs(t[None, :, None] - sample_x[g][:, None, :])
+        bandwidth = np.take_along_axis(np.sort(distances, axis=2), (neighbours[g] - 1)[:, None, None], axis=2)
+        weights = np.clip(1 - (distances / np.maximum(bandwidth, 1e-12)) ** 3, 0, None) ** 3
+        bx, by = np.where(np.isinf(sample_x[g]), 0, sample_x[g])[:, None, :], sample_y[g][:, None, :]
+        sw = weights.sum(axis=2)
+        mx, my = (weights * bx).sum(axis=2) / sw, (weights * by).sum(axis=2) / sw
+        var = (weights * bx * bx).sum(axis=2) / sw - mx * mx
+        cov = (weights * bx * by).sum(axis=2) / sw - mx * my
+        slope = np.divide(cov, var, out=np.zeros_like(var), where=var > 1e-12)
+        fitted[i:i + block] = my + slope * (t[None, :] - mx)
+
+    line_x = (low[groups][:, None] + t[None, :] * scale[groups][:, None]).ravel()
+    return line_x, fitted.ravel(), np.repeat(groups, nb_points)
+
+
+def png_data_uri(image, compression=6):
+    """
+    Encodes a uint8 image (gray (h, w), RGB (h, w, 3) or RGBA (h, w, 4)) as a PNG data URI
+    that can be given to the 'source' of a plotly Image.
+    """
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    height, width = image.shape[:2]
+    color_type = {2: 0, 3: {3: 2, 4: 6}.get(image.shape[-1])}[image.ndim]
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+    # Every row starts with the filter type (0: no filter)
+    rows = np.concatenate([np.zeros((height, 1), dtype=np.uint8), image.reshape(height, -1)], axis=1)
+    png = b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)),
+        chunk(b"IDAT", zlib.compress(rows.tobytes(), compression)),
+        chunk(b"IEND", b""),
+    ])
+    return "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+
+
+def payload_bytes(value):
+    """
+    Estimates the size of a value once serialized by plotly: numeric arrays are sent as
+    base64 typed arrays, the other arrays (dates, strings, lists) as JSON lists.
+    """
+    if isinstance(value, dict):
+        return sum(payload_bytes(v) for v in value.values())
+    if isinstance(value, (pandas.Index, pandas.Series)):
+        value = np.asarray(value)
+    if isinstance(value, np.ndarray) and value.dtype.kind in "biuf":
+        return 4 * -(-value.nbytes // 3) + 32
+    if isinstance(value, np.ndarray) and value.dtype.kind == "M":
+        return 23 * value.size
+    if isinstance(value, (np.ndarray, list, tuple)):
+        if len(value) == 0:
+            return 2
+        sample = value[::max(1, len(value) // 100)][:100]
+        return int(len(value) * np.mean([len(str(item)) + (3 if isinstance(item, str) else 1) for item in sample]))
+    return len(str(value)) if value is not None else 0
+
+
+def payload_points(value):
+    """
+    Returns the number of points of a trace: the length of its longest data array.
+    """
+    if isinstance(value, dict):
+        return max((payload_points(v) for v in value.values()), default=0)
+    if isinstance(value, (np.ndarray, list, tuple, pandas.Index, pandas.Series)):
+        return len(value)
+    return 0
+
+
+def water_fill(costs, budget):
+    """
+    Shares a budget between costs: the costs under the fair share are kept and what they
+    leave is split evenly between the larger ones.
+    """
+    order = sorted(range(len(costs)), key=costs.__getitem__)
+    shares, remaining = list(costs), max(budget, 0)
+
+    for k, i in enumerate(order):
+        level = remaining / (len(order) - k)
+        if costs[i] > level:
+            for j in order[k:]:
+                shares[j] = level
+            break
+        remaining -= costs[i]
+    return shares
+
+
+def minmax_indices(values, nb_points):
+    """
+    Returns the sorted indices of the minimum and maximum of (nb_points - 2) // 2 consecutive
+    buckets of values (and of the first and last points): a decimation that keeps the peaks of
+    a signal.
+    """
+    size = len(values)
+    if size <= nb_points:
+        return np.arange(size)
+
+    nb_buckets = max(1, (nb_points - 2) // 2)
+    width = -(-size // nb_buckets)
+    blocks = np.full(nb_buckets * width, np.nan)
+    blocks[:size] = values
+    blocks = blocks.reshape(nb_buckets, width)
+    missing = np.isnan(blocks)
+
+    offsets = np.arange(nb_buckets) * width
+    low = np.where(missing, np.inf, blocks).argmin(axis=1) + offsets
+    high = np.where(missing, -np.inf, blocks).argmax(axis=1) + offsets
+    indices = np.unique(np.r_[0, low, high, size - 1])
+    return indices[indices < size]
+
+
+def float32_update(props):
+    """
+    Returns the update replacing the float64 arrays of a trace (and of its marker) by float32
+    ones, for the arrays whose rounding error stays negligible compared to their spread.
+    """
+    def downcast(values):
+        finite = values[np.isfinite(values)]
+        if finite.size == 0:
+            return True
+        magnitude, spread = np.abs(finite).max(), finite.max() - finite.min()
+        return magnitude * 2.0 ** -24 <= (spread if spread > 0 else magnitude) * 1e-4
+
+    update = {}
+    for key, value in props.items():
+        if isinstance(value, dict) and key == "marker":
+            nested = float32_update(value)
+            if nested:
+                update[key] = nested
+        elif isinstance(value, np.ndarray) and value.dtype == np.float64 and downcast(value):
+            update[key] = value.astype(np.float32)
+    return update
+
+
+def decimate_update(props, nb_points):
+    """
+    Returns the update keeping about nb_points points of a scatter trace (min/max decimation
+    on y, or on x for horizontal data) in every array of one value per point.
+    """
+    size = payload_points({key: props.get(key) for key in ("x", "y")})
+    values = next((
+        np.asarray(props[key]) for key in ("y", "x")
+        if isinstance(props.get(key), (np.ndarray, list, tuple)) and len(props[key]) == size and np.asarray(props[key]).dtype.kind in "biuf"
+    ), None)
+    if values is not None:
+        indices = minmax_indices(values.astype(float), nb_points)
+    else:
+        indices = np.unique(np.linspace(0, size - 1, max(nb_points, 2)).astype(np.int64))
+
+    def select(props):
+        update = {}
+        for key, value in props.items():
+            if isinstance(value, dict) and key in ("marker", "line"):
+                nested = select(value)
+                if nested:
+                    update[key] = nested
+            elif isinstance(value, (np.ndarray, list, tuple)) and len(value) == size:
+                update[key] = np.asarray(value)[indices]
+        return update
+
+    update = select(props)
+    # An evenly spaced axis given as x0/dx (see make_grid.encode_regular_axes) is written out
+    # at the kept positions, the points would be drawn at the wrong place otherwise
+    for axis in ("x", "y"):
+        step = props.get(f"d{axis}")
+        if props.get(axis) is None and step is not None and update:
+            start = props.get(f"{axis}0", 0)
+            if isinstance(start, str):
+                positions = (pandas.Timestamp(start) + pandas.to_timedelta(indices * step, unit="ms")).to_numpy()
+            else:
+                positions = start + indices * step
+            update.update({axis: positions, f"{axis}0": None, f"d{axis}": None})
+    return update
+
+
+def histogram_update(props, nb_bins):
+    """
+    Returns the update replacing the raw values of a histogram by its counts in at most nb_bins
+    bins (summed by plotly, so histnorm still applies), or None if it cannot be pre-aggregated.
+    """
+    if props.get("x") is None and props.get("y") is None:
+        return None
+    if props.get("x") is not None and props.get("y") is not None:
+        # Counted histograms ignore the values of the other axis (like the default index
+        # given as y to the histograms of arrays), only the binned axis is kept
+        if props.get("histfunc") not in (None, "count"):
+            return None
+        axis, other = ("y", "x") if props.get("orientation") == "h" else ("x", "y")
+    else:
+        axis, other = ("x", "y") if props.get("x") is not None else ("y", "x")
+    values = np.asarray(props[axis])
+    if values.dtype.kind not in "biuf" or f"{axis}bins" in props:
+        return None
+
+    values = values[np.isfinite(values)].astype(float)
+    if values.size == 0:
+        return None
+    bins = props.get(f"nbins{axis}") or len(np.histogram_bin_edges(values, "auto")) - 1
+    counts, edges = np.histogram(values, max(1, min(bins, nb_bins)))
+    return {
+        axis: (edges[:-1] + edges[1:]) / 2, other: counts, "histfunc": "sum", f"nbins{axis}": None,
+        f"{axis}bins": dict(start=edges[0], end=edges[-1], size=edges[1] - edges[0]),
+    }
+
+
+def box_update(props):
+    """
+    Returns the update replacing the raw values of a box trace by its precomputed quartiles
+    and fences (one box per position), or None if it cannot be pre-aggregated.
+    """
+    horizontal = props.get("orientation") == "h" or props.get("y") is None
+    value_axis, position_axis = ("x", "y") if horizontal else ("y", "x")
+    values, positions = np.asarray(props.get(value_axis)), props.get(position_axis)
+    if values.dtype.kind not in "biuf":
+        return None
+
+    values = values.astype(float)
+    codes, uniques = pandas.factorize(np.asarray(positions)) if positions is not None else (np.zeros(len(values), dtype=np.int64), [None])
+    stats = []
+    for code in range(len(uniques)):
+        group = values[(codes == code) & ~np.isnan(values)]
+        q0, q1, q2, q3, q4 = np.percentile(group, [0, 25, 50, 75, 100]) if group.size else [np.nan] * 5
+        stats.append((q1, q2, q3, max(q0, q1 - 1.5 * (q3 - q1)), min(q4, q3 + 1.5 * (q3 - q1))))
+
+    q1, median, q3, lower, upper = (list(stat) for stat in zip(*stats))
+    update = {
+        value_axis: None, "q1": q1, "median": median, "q3": q3, "lowerfence": lower, "upperfence": upper,
+        "boxpoints": False, "orientation": "h" if horizontal else "v",
+    }
+    if positions is not None:
+        update[position_axis] = list(uniques)
+    return update
+
+
+def apply_budget(traces, max_bytes=None, max_points=None, labels=None):
+    """
+    Degrades plotly traces (in place) until their estimated payload fits max_bytes and their
+    number of points fits max_points, and returns a report of what was degraded.
+
+    The budget is shared between the traces by water-filling (see water_fill). A trace above
+    its share steps down from float32 encoding (for max_bytes) to the min/max decimation of
+    scatter traces, or to the pre-aggregation of histograms and boxes. The other traces are
+    kept as they are, a warning is raised if the traces still do not fit.
+    """
+    labels = labels if labels is not None else [None] * len(traces)
+    degradable = ("scatter", "scattergl", "histogram", "box")
+    before = [(payload_points(t._props), payload_bytes(t._props)) for t in traces]
+    steps = [[] for _ in traces]
+
+    for limit, measure in ((max_points, payload_points), (max_bytes, payload_bytes)):
+        if limit is None:
+            continue
+        # trace._props only holds the properties that were set (to_plotly_json would copy the data)
+        costs = [measure(t._props) for t in traces]
+        if sum(costs) <= limit:
             continue
 
-        c = df[col].isna().sum()
+        candidates = [i for i, t in enumerate(traces) if t.type in degradable]
+        fixed = sum(cost for i, cost in enumerate(costs) if i not in candidates)
+        shares = water_fill([costs[i] for i in candidates], limit - fixed)
+
+        for i, share in zip(candidates, shares):
+            trace, cost = traces[i], costs[i]
+            if cost <= share:
+                continue
+
+            if measure is payload_bytes:
+                update = float32_update(trace._props)
+                if update:
+                    trace.update(update)
+                    steps[i].append("float32")
+                    cost = payload_bytes(trace._props)
+                    if cost <= share:
+                        continue
+
+            points = payload_points(trace._props)
+            target = max(2, int(points * share / cost))
+            if trace.type in ("scatter", "scattergl"):
+                trace.update(decimate_update(trace._props, target))
+                steps[i].append(f"min/max decimation ({target} points)")
+            elif trace.type == "histogram" and trace.histfunc != "sum":
+                update = histogram_update(trace._props, target)
+                if update is not None:
+                    trace.update(update)
+                    steps[i].append("pre-aggregated bins")
+            elif trace.type == "box" and trace.q1 is None:
+                update = box_update(trace._props)
+                if update is not None:
+                    trace.update(update)
+                    steps[i].append("pre-aggregated quartiles")
+
+    for limit, measure, unit in ((max_points, payload_points, "points"), (max_bytes, payload_bytes, "bytes")):
+        cost = sum(measure(t._props) for t in traces) if limit is not None else 0
+        if limit is not None and cost > limit:
+            warnings.warn(f"The figure does not fit its budget of {limit} {unit} ({cost} {unit}): its traces cannot be degraded further.")
+
+    return [
+        dict(
+            cell=label, trace=trace.name, type=trace.type, steps=trace_steps,
+            points=(points, payload_points(trace._props)), bytes=(nbytes, payload_bytes(trace._props)),
+        )
+        for trace, label, trace_steps, (points, nbytes) in zip(traces, labels, steps, before) if trace_steps
+    ]
+
+
+def regular_step(values):
+    """
+    Returns (x0, dx) if values are evenly spaced numbers or dates (dx in milliseconds for
+    dates, as expected by plotly), None otherwise.
+    """
+    values = np.asarray(values)
+    if len(values) < 3 or values.dtype.kind not in "iufM":
+        return None
+
+    if values.dtype.kind == "M":
+        if np.isnat(values).any():
+            return None
+        steps = np.diff(values.astype(np.int64))
+        if steps[0] == 0 or np.any(steps != steps[0]):
+            return None
+        unit = np.timedelta64(1, np.datetime_data(values.dtype)[0]) / np.timedelta64(1, "ms")
+        return str(np.datetime_as_string(values[0])), steps[0].item() * unit
+
+    steps = np.diff(values)
+    if steps[0] == 0 or not np.allclose(steps, steps[0], rtol=1e-9, atol=0):
+        return None
+    if values.dtype.kind == "f":
+        return values[0].item(), ((values[-1] - values[0]) / (len(values) - 1)).item()
+    return values[0].item(), steps[0].item()
+
+
+def share_buffers(figure, min_length=64):
+    """
+    Replaces the arrays repeated in several traces of a figure dictionary (like the x-axis
+    shared by many lines) by references {"wpbuffer": k} to a list of buffers, and returns
+    that list. Typed arrays are compared by their base64 data, the other arrays by value.
+    """
+    references = {}
+    for trace in figure.get("data", []):
+        for key, value in trace.items():
+            if isinstance(value, dict) and "bdata" in value and len(value["bdata"]) >= min_length:
+                signature = (value.get("dtype"), str(value.get("shape")), value["bdata"])
+            elif isinstance(value, (list, tuple)) and len(value) >= min_length:
+                try:
+                    signature = tuple(value)
+                    hash(signature)
+                except TypeError:
+                    continue
+            else:
+                continue
+            references.setdefault(signature, []).append((trace, key))
+
+    buffers = []
+    for refs in references.values():
+        if len(refs) > 1:
+            trace, key = refs[0]
+            buffers.append(trace[key])
+            for trace, key in refs:
+                trace[key] = {"wpbuffer": len(buffers) - 1}
+    return buffers
+
+
+def plotlyjs_script(include_plotlyjs):
+    """
+    Returns the script tag loading plotly.js: embedded (True), from the CDN ("cdn") or
+    nothing (False), like in plotly's to_html.
+    """
+    if include_plotlyjs == "cdn":
+        return f'<script src="https://cdn.plot.ly/plotly-{plotly.offline.get_plotlyjs_version()}.min.js"></script>'
+    elif include_plotlyjs:
+        return f"<script>{plotly.offline.get_plotlyjs()}</script>"
+    return ""
+
 
+def figure_html(figure, buffers=(), include_plotlyjs="cdn", div_id="wraplotly-figure"):
+    """
+    Returns a standalone HTML page drawing a figure dictionary whose shared arrays were
+    replaced by references to buffers (see share_buffers). include_plotlyjs is True (embedded),
+    "cdn" or False, like in plotly's to_html.
+    """
+    return f"""<html>
+<head><meta charset="utf-8" />{plotlyjs_script(include_plotlyjs)}</head>
+<body>
+<div id="{div_id}"></div>
+<script>
+(function () {{
+    var buffers = {to_json_plotly(list(buffers))};
+    var figure = {to_json_plotly(figure)};
+    figure.data.forEach(function (trace) {{
+        Object.keys(trace).forEach(function (key) {{
+            var value = trace[key];
+            if (value !== null && typeof value === "object" && "wpbuffer" in value) trace[key] = buffers[value.wpbuffer];
+        }});
+    }});
+    Plotly.newPlot("{div_id}", figure.data, figure.layout, {{responsive: true}});
+}})();
+</script>
+</body>
+</html>"""
+
+
+def figure_mimebundle(figure, text, include=None, exclude=None):
+    """
+    Returns the notebook representation of a built figure: the plotly mimetype (read by
+    JupyterLab and VS Code, numeric arrays being sent as compact typed arrays) and an HTML
+    fallback for the classic notebook, loading plotly.js from the CDN so that it neither weighs
+    on the saved notebook nor depends on what the page displayed before (the browser caches it).
+    Widgets (resampled figures) keep their own representation.
+    """
+    if isinstance(figure, BaseFigureWidget):
+        bundle = figure._repr_mimebundle_(include, exclude)
+    else:
+        figure = json.loads(to_json_plotly(figure.to_dict()))
+        html = plotly.io.to_html(figure, include_plotlyjs="cdn", full_html=False, validate=False)
+        bundle = {"application/vnd.plotly.v1+json": {**figure, "config": {}}, "text/html": html}
+
+    bundle = {**(bundle or {}), "text/plain": text}
+    return {
+        mimetype: data for mimetype, data in bundle.items()
+        if (include is None or mimetype in include) and (exclude is None or mimetype not in exclude)
+    }
+
+
+def count_points(df, x=None, y=None):
+    """
+    Returns the number of points of a plot: the rows of the dataframe (times the number of
+    y columns in wide form) if one is used, the length of the longest of the x and y arrays
+    otherwise.
+    """
+    if df is not None:
+        # wide form: every y column is a series
+        return len(df) * (len(y) if isinstance(y, list) else 1)
+    return max((len(arg) for arg in (x, y) if arg is not None and not isinstance(arg, str)), default=0)
+
+
+def nan_range(arrays):
+    """
+    Returns the (min, max) of the values of several numeric arrays, ignoring NaNs, or
+    (None, None) if they have no values.
+    """
+    bounds = [(np.nanmin(a), np.nanmax(a)) for a in arrays if len(a) and not np.isnan(a).all()]
+    if not bounds:
+        return None, None
+    return float(min(b[0] for b in bounds)), float(max(b[1] for b in bounds))
+
+
+def needs_resample(df, x=None, y=None):
+    return count_points(df, x, y) > get_option("min_points_before_resampling")
+
+
+class resampling:
+    """
+    A resampling policy: when plotly-resampler should be used and how it should aggregate.
+
+    It can be given to any plot2d object (resampling=...) or to an arrangement, in which case
+    the threshold is compared to the total number of points of every trace of the figure.
+
+    Attributes
+    ----------
+    + threshold: int
+        The number of points above which the data is resampled (default: MIN_POINTS_BEFORE_RESAMPLING).
+    + aggregator: str|AbstractAggregator
+        "MinMaxLTTB", "EveryNth", "MinMax" or a plotly-resampler aggregator instance.
+    + n_shown_samples: int
+        The number of samples shown for each resampled trace.
+    """
+    aggregators = {"MinMaxLTTB": "MinMaxLTTB", "EveryNth": "EveryNthPoint", "MinMax": "MinMaxAggregator"}
+
+    def __init__(self, threshold=None, aggregator=None, n_shown_samples=None):
+        if isinstance(aggregator, str) and aggregator not in self.aggregators:
+            raise ValueError(f"Unknown aggregator '{aggregator}' (expected one of {list(self.aggregators)}).")
+
+        self.threshold = threshold
+        self.aggregator = aggregator
+        self.n_shown_samples = n_shown_samples
+
+    def needs_resample(self, nb_points):
+        if not resampler_enabled.get():
+            return False
+        threshold = self.threshold if self.threshold is not None else get_option("min_points_before_resampling")
+        return nb_points > threshold
+
+    def downsampler(self):
+        if not isinstance(self.aggregator, str):
+            return self.aggregator
+        from plotly_resampler import aggregation
+        return getattr(aggregation, self.aggregators[self.aggregator])()
+
+    def figure_kwargs(self):
+        """
+        The arguments given to FigureWidgetResampler.
+        """
+        kwargs = {}
+        if self.aggregator is not None: kwargs["default_downsampler"] = self.downsampler()
+        if self.n_shown_samples is not None: kwargs["default_n_shown_samples"] = self.n_shown_samples
+        return kwargs
+
+    def trace_kwargs(self):
+        """
+        The arguments given to FigureWidgetResampler.add_trace.
+        """
+        kwargs = {}
+        if self.aggregator is not None: kwargs["downsampler"] = self.downsampler()
+        if self.n_shown_samples is not None: kwargs["max_n_samples"] = self.n_shown_samples
+        return kwargs
+
+
+def resampling_assertion(obj, header=""):
+    """
+    Returns the resampling policy given as obj (the default policy for None).
+    """
+    if obj is None:
+        return resampling()
+    if not isinstance(obj, resampling):
+        raise TypeError(f"{header}: resampling should be a wp.resampling policy (like wp.resampling(threshold=0)), got '{type(obj)}' instead.")
+    return obj
+
+
+def count_nans_in_df_and_alert(df, *cols, scans=None):
+    # Lists of columns (wide form) are audited too, each column is scanned once per build
+    scans = scans if scans is not None else column_scans()
+    cols = dict.fromkeys(c for col in cols if col is not None for c in (col if isinstance(col, list) else [col]))
+
+    for col in cols:
+        c = scans.scan(df[col]).nans if col in df.columns else 0
         if c >= 1:
             warnings.warn(f"Column '{col}' of the passed dataframe contains {c} occurence(s) of NaN. This might result in faulty plots.")
 
 
+def source_keys(df, projection):
+    """
+    Returns the keys under which the columns of projection (copied from df, see
+    project_columns) can share their scans: the memory of each source column and its name.
+    """
+    return {column: (memory_key(df[column]), column) for column in projection.columns}
+
+
+def memory_key(values):
+    """
+    Returns a key identifying the memory holding values: two series reading the same buffer
+    (like the columns of a dataframe shared by several plots) have the same key.
+    """
+    array = getattr(values, "array", values)
+    array = getattr(array, "_ndarray", array)
+    if isinstance(array, np.ndarray):
+        return (array.__array_interface__["data"][0], array.shape, array.strides, array.dtype.str)
+    return id(array)
+
+
+class column_scan:
+    """
+    The results of scanning one column, each computed once and only when first needed.
+
+    Attributes
+    ----------
+    + values: Series|array
+        The scanned column.
+    + codes / uniques: array
+        The factorization of the column (NaN is a value of its own), in order of appearance.
+    + nunique: int
+        The number of distinct values (NaN included).
+    + nans: int
+        The number of missing values.
+
+    Methods
+    -------
+    + indices(value):
+        Returns the positions of the rows equal to value
+    """
+    def __init__(self, values, lock=None):
+        self.values = values
+        self.lock = lock if lock is not None else threading.RLock()
+        self._factors = None
+        self._groups = None
+        self._nans = None
+
+    def factorize(self):
+        with self.lock:
+            if self._factors is None:
+                self._factors = pandas.factorize(self.values, use_na_sentinel=False)
+            return self._factors
+
+    @property
+    def codes(self):
+        return self.factorize()[0]
+
+    @property
+    def uniques(self):
+        return self.factorize()[1]
+
+    @property
+    def nunique(self):
+        return len(self.uniques)
+
+    @property
+    def nans(self):
+        with self.lock:
+            if self._nans is None:
+                self._nans = int(np.count_nonzero(pandas.isna(self.values)))
+            return self._nans
+
+    def indices(self, value):
+        with self.lock:
+            if self._groups is None:
+                # one stable sort gives the rows of every group
+                codes = self.codes
+                order = np.argsort(codes, kind="stable")
+                bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=self.nunique))])
+                self._lookup = {value: code for code, value in enumerate(self.uniques) if not pandas.isna(value)}
+                self._nan_code = next((code for code, value in enumerate(self.uniques) if pandas.isna(value)), None)
+                self._groups = {code: order[bounds[code]:bounds[code + 1]] for code in range(self.nunique)}
+
+        code = self._nan_code if pandas.isna(value) else self._lookup.get(value)
+        return self._groups[code] if code is not None else np.empty(0, dtype=np.intp)
+
+
+class column_scans:
+    """
+    The scans of the columns read while building a figure, shared by all of its cells.
+
+    Plot objects only record which columns they use; the distinct values, group indices and
+    NaN counts of a column are computed at build time, once per column even when several
+    cells (or several steps of the build) read it. Columns are identified by their memory
+    (see memory_key), so cells reading the same dataframe share their scans, or by the key
+    they were shared with (like the copies of a column projected by several plots).
+
+    Methods
+    -------
+    + scan(values):
+        Returns the column_scan of values
+    + share(values, key):
+        Identifies the column values by key, if they are equal to the first values shared
+        with that key
+    """
+    def __init__(self):
+        self.scans = {}
+        self.keys = {}
+        self.shared = {}
+        self.lock = threading.RLock()
+
+    def share(self, values, key):
+        with self.lock:
+            first = self.shared.setdefault(key, values)
+            # A key only tells where the values were copied from: the source may have been
+            # modified in place between two copies
+            if first is values or memory_key(first) == memory_key(values) or first.equals(values):
+                self.keys[memory_key(values)] = key
+
+    def scan(self, values):
+        key = memory_key(values)
+        with self.lock:
+            key = self.keys.get(key, key)
+            if key not in self.scans:
+                self.scans[key] = column_scan(values, self.lock)
+            return self.scans[key]
+
+
 def count_nans_and_alert(*args):
     for arg in args:
         if arg is None or isinstance(arg, str):